@@ -11,23 +11,64 @@ import itertools
 import pickle
 import os
 import json
-from typing import Tuple, List, Dict, Any
+import hashlib
+import inspect
+import tempfile
+import multiprocessing
+import platform
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from functools import lru_cache
+from contextlib import contextmanager
+from typing import Tuple, List, Dict, Any, Optional, Iterable, Iterator
 
 # Bibliotecas Quânticas (Qiskit 1.x+)
 try:
     from qiskit_algorithms import QAOA, VQE
     from qiskit_algorithms.optimizers import COBYLA, SPSA
     from qiskit.primitives import Sampler, StatevectorSampler
-    from qiskit.circuit import QuantumCircuit
+    from qiskit import transpile
+    from qiskit.circuit import QuantumCircuit, ParameterVector
     from qiskit.quantum_info import SparsePauliOp
+    from qiskit_optimization import QuadraticProgram
     from qiskit_optimization.applications import Tsp
     from qiskit_optimization.algorithms import MinimumEigenOptimizer
-    from qiskit_ibm_runtime import QiskitRuntimeService
     QISKIT_AVAILABLE = True
 except ImportError as e:
     print(f"⚠️  Aviso: Bibliotecas Qiskit não disponíveis ({e})")
     QISKIT_AVAILABLE = False
 
+# Qiskit Runtime (IBM Quantum) é opcional: só a execução em hardware depende dele
+try:
+    from qiskit_ibm_runtime import QiskitRuntimeService, Session, Batch
+    from qiskit_ibm_runtime import SamplerV2 as RuntimeSampler
+    RUNTIME_AVAILABLE = True
+except ImportError:
+    RUNTIME_AVAILABLE = False
+
+# Simulador local para os circuitos QAOA dos notebooks
+try:
+    from qiskit_aer import AerSimulator
+    AER_AVAILABLE = True
+except ImportError:
+    AER_AVAILABLE = False
+
+# SciPy é opcional: forma esparsa do Hamiltoniano e COBYLA do QAOA nativo
+try:
+    import scipy.sparse
+    from scipy.optimize import minimize
+    from scipy.sparse.linalg import expm_multiply
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+# fcntl (POSIX) serializa gravações concorrentes do store de parâmetros
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
 # ============================================================================
 # 1. DEFINIÇÃO DOS GRAFOS E ESTRUTURAS
 # ============================================================================
@@ -39,136 +80,3270 @@ GRAPHS = {
     6: [[0, 3, 6, 7, 8, 9], [3, 0, 5, 6, 7, 8], [6, 5, 0, 4, 5, 6], [7, 6, 4, 0, 3, 4], [8, 7, 5, 3, 0, 2], [9, 8, 6, 4, 2, 0]]
 }
 
-OUTPUT_DIR = "/home/claude/tsp_results"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+OUTPUT_DIR = "/home/claude/tsp_results"
+os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+# ============================================================================
+# 1.1 CACHE DE SOLUÇÕES EM DISCO (ENDEREÇADO POR CONTEÚDO)
+# ============================================================================
+
+CACHE_DIR = f"{OUTPUT_DIR}/cache"
+CACHE_MAX_ENTRIES = 512
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+def solution_cache_key(distance_matrix: List[List[float]], solver: str, **config) -> str:
+    """
+    Chave SHA-256 da matriz de distâncias + solver + configuração.
+
+    A matriz entra como float64 contíguo (mais o shape), de modo que a
+    mesma instância dá a mesma chave vinda de lista, tupla ou array.
+
+    Args:
+        distance_matrix: Matriz de distâncias
+        solver: Nome do solver
+        **config: Parâmetros que alteram o resultado (p, maxiter, seed, backend...)
+
+    Returns:
+        Hash hexadecimal
+    """
+    D = np.ascontiguousarray(distance_matrix, dtype=np.float64)
+    digest = hashlib.sha256()
+    digest.update(str(D.shape).encode())
+    digest.update(D.tobytes())
+    digest.update(json.dumps({"solver": solver, **config}, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def cache_get(cache_dir: str, key: str) -> Optional[Any]:
+    """
+    Lê uma entrada do cache; None se ausente ou corrompida.
+
+    O acesso atualiza o mtime do arquivo, que é a ordem LRU usada na remoção.
+    """
+    path = os.path.join(cache_dir, f"{key}.pkl")
+    try:
+        with open(path, 'rb') as f:
+            value = pickle.load(f)
+        os.utime(path)
+        return value
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+
+def cache_put(cache_dir: str, key: str, value: Any,
+              max_entries: int = CACHE_MAX_ENTRIES,
+              max_bytes: int = CACHE_MAX_BYTES):
+    """
+    Grava uma entrada (escrita atômica) e aplica os limites LRU.
+
+    Args:
+        cache_dir: Diretório do cache
+        key: Chave de solution_cache_key
+        value: Objeto serializável com pickle
+        max_entries: Número máximo de entradas
+        max_bytes: Tamanho máximo total em bytes
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(value, f)
+        os.replace(tmp_path, os.path.join(cache_dir, f"{key}.pkl"))
+    except BaseException:
+        # Não deixa .tmp órfão se a serialização falhar
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    prune_cache(cache_dir, max_entries, max_bytes)
+
+
+def prune_cache(cache_dir: str,
+                max_entries: int = CACHE_MAX_ENTRIES,
+                max_bytes: int = CACHE_MAX_BYTES) -> int:
+    """
+    Remove as entradas menos recentemente usadas até respeitar os limites.
+
+    Returns:
+        Número de entradas removidas
+    """
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith(".pkl"):
+            try:
+                st = entry.stat()
+            except OSError:
+                # Removida por outro processo durante a varredura
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+    entries.sort()
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    while entries and (len(entries) > max_entries or total > max_bytes):
+        _, size, path = entries.pop(0)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+# ============================================================================
+# 2. FUNÇÕES CLÁSSICAS (BRUTE FORCE TSP)
+# ============================================================================
+
+def calculate_route_cost(route: Tuple[int, ...], distance_matrix: List[List[float]]) -> float:
+    """Calcula o custo total de uma rota."""
+    cost = 0
+    for i in range(len(route) - 1):
+        cost += distance_matrix[route[i]][route[i + 1]]
+    return cost
+
+
+def calculate_route_costs(routes: np.ndarray, distance_matrix: List[List[float]]) -> np.ndarray:
+    """
+    Calcula o custo de um lote de rotas de uma só vez.
+
+    Versão vetorizada de calculate_route_cost: um único gather na matriz de
+    distâncias seguido de soma por linha.
+
+    Args:
+        routes: Array inteiro (m, k) — tipicamente (m, n+1) com a volta à
+            origem —; cada linha é um caminho. Um vetor 1-D é tratado como m=1
+        distance_matrix: Matriz de distâncias
+
+    Returns:
+        Array (m,) com o custo de cada rota
+    """
+    R = np.asarray(routes, dtype=np.intp)
+    if R.ndim == 1:
+        R = R[None, :]
+    D = np.asarray(distance_matrix, dtype=float)
+    return D[R[:, :-1], R[:, 1:]].sum(axis=1)
+
+
+def solve_tsp_brute_force(distance_matrix: List[List[float]],
+                          stats: Optional[Dict[str, Any]] = None,
+                          cache_dir: Optional[str] = None) -> Tuple[float, Tuple[int, ...], float]:
+    """
+    Resolve TSP por força bruta (permutações).
+    
+    Args:
+        distance_matrix: Matriz de distâncias
+        stats: Se fornecido, recebe o contador "routes_evaluated"
+            (e "cache_hit" quando o cache está ativo)
+        cache_dir: Diretório do cache de soluções (ex.: CACHE_DIR);
+            None desativa. Em um acerto o tempo devolvido é o da execução
+            original, para não distorcer comparações de speedup
+    
+    Returns:
+        (custo_ótimo, rota_ótima, tempo_execução)
+    """
+    if cache_dir is not None:
+        key = solution_cache_key(distance_matrix, "brute_force")
+        cached = cache_get(cache_dir, key)
+        if cached is not None:
+            min_cost, best_route, elapsed_time, cached_stats = cached
+            if stats is not None:
+                stats.update(cached_stats, cache_hit=True)
+            return min_cost, best_route, elapsed_time
+    
+    start_time = time.time()
+    n = len(distance_matrix)
+    vertices = list(range(1, n))  # Começa do vértice 1
+    
+    min_cost = float('inf')
+    best_route = None
+    evaluated = 0
+    
+    for perm in itertools.permutations(vertices):
+        route = (0,) + perm + (0,)  # Volta ao início
+        cost = calculate_route_cost(route, distance_matrix)
+        evaluated += 1
+        
+        if cost < min_cost:
+            min_cost = cost
+            best_route = route
+    
+    if stats is not None:
+        stats["routes_evaluated"] = evaluated
+    
+    elapsed_time = time.time() - start_time
+    
+    if cache_dir is not None:
+        cache_put(cache_dir, key, (min_cost, best_route, elapsed_time, {"routes_evaluated": evaluated}))
+        if stats is not None:
+            stats["cache_hit"] = False
+    
+    return min_cost, best_route, elapsed_time
+
+
+@lru_cache(maxsize=None)
+def _index_permutations(m: int) -> np.ndarray:
+    """Todas as permutações de range(m) em ordem lexicográfica, shape (m!, m)."""
+    return np.array(list(itertools.permutations(range(m))), dtype=np.intp).reshape(-1, m)
+
+
+def _brute_force_from_head(D: np.ndarray,
+                           head: Tuple[int, ...],
+                           block_size: int) -> Tuple[float, Tuple[int, ...], int]:
+    """
+    Enumera exaustivamente todas as rotas que começam por `head`.
+
+    As posições do meio são enumeradas em Python; as últimas `block_size`
+    posições são avaliadas de uma vez com indexação avançada do NumPy,
+    reaproveitando o custo parcial já acumulado. As arestas do bloco são
+    somadas uma a uma, da esquerda para a direita, como em
+    calculate_route_cost, para que os custos saiam bit a bit iguais e os
+    empates resolvam para a primeira rota na ordem lexicográfica.
+
+    Returns:
+        (melhor_custo, melhor_rota, rotas_avaliadas)
+    """
+    n = len(D)
+    rest = [v for v in range(1, n) if v not in head]
+    if not rest:
+        route = head + (0,)
+        return float(calculate_route_cost(route, D)), route, 1
+
+    m = min(len(rest), block_size)
+    suffix_perms = _index_permutations(m)
+
+    min_cost = float('inf')
+    best_route = None
+    evaluated = 0
+
+    for middle in itertools.permutations(rest, len(rest) - m):
+        path = head + middle
+        prefix_cost = calculate_route_cost(path, D)
+        remaining = np.array(sorted(set(rest) - set(middle)), dtype=np.intp)
+
+        # Segmentos finais: último do prefixo → bloco → origem
+        cities = remaining[suffix_perms]  # (m!, m)
+        segments = np.empty((len(cities), m + 2), dtype=np.intp)
+        segments[:, 0] = path[-1]
+        segments[:, 1:-1] = cities
+        segments[:, -1] = 0
+        costs = np.full(len(segments), float(prefix_cost))
+        for j in range(m + 1):
+            costs += D[segments[:, j], segments[:, j + 1]]
+        evaluated += len(costs)
+
+        idx = int(np.argmin(costs))
+        if costs[idx] < min_cost:
+            min_cost = float(costs[idx])
+            best_route = path + tuple(int(c) for c in cities[idx]) + (0,)
+
+    return min_cost, best_route, evaluated
+
+
+def solve_tsp_brute_force_vectorized(distance_matrix: List[List[float]],
+                                     block_size: int = 8,
+                                     stats: Optional[Dict[str, Any]] = None) -> Tuple[float, Tuple[int, ...], float]:
+    """
+    Força bruta exaustiva vetorizada em blocos de permutações.
+
+    A ordem de enumeração é a mesma de solve_tsp_brute_force, portanto
+    empates resolvem para a mesma rota.
+
+    Args:
+        distance_matrix: Matriz de distâncias
+        block_size: Posições finais avaliadas em cada bloco ((block_size)! rotas)
+        stats: Se fornecido, recebe o contador "routes_evaluated"
+
+    Returns:
+        (custo_ótimo, rota_ótima, tempo_execução)
+    """
+    if block_size < 1:
+        raise ValueError(f"block_size deve ser >= 1 (recebido: {block_size})")
+
+    start_time = time.time()
+    D = np.asarray(distance_matrix, dtype=float)
+
+    min_cost, best_route, evaluated = _brute_force_from_head(D, (0,), block_size)
+
+    if stats is not None:
+        stats["routes_evaluated"] = evaluated
+
+    elapsed_time = time.time() - start_time
+    return min_cost, best_route, elapsed_time
+
+
+# Matriz de distâncias compartilhada (somente leitura) em cada worker
+_SHARED_DISTANCE_MATRIX = None
+
+
+def _init_brute_force_worker(distance_matrix: np.ndarray):
+    """Inicializador do worker: recebe a matriz uma única vez por processo."""
+    global _SHARED_DISTANCE_MATRIX
+    _SHARED_DISTANCE_MATRIX = distance_matrix
+    _SHARED_DISTANCE_MATRIX.setflags(write=False)
+
+
+def _brute_force_shard(shard: Tuple[int, ...], block_size: int) -> Tuple[float, Tuple[int, ...], int]:
+    """Resolve um shard (prefixo fixo) usando a matriz compartilhada do worker."""
+    return _brute_force_from_head(_SHARED_DISTANCE_MATRIX, (0,) + shard, block_size)
+
+
+def solve_tsp_brute_force_parallel(distance_matrix: List[List[float]],
+                                   max_workers: Optional[int] = None,
+                                   shard_depth: Optional[int] = None,
+                                   block_size: int = 8,
+                                   stats: Optional[Dict[str, Any]] = None) -> Tuple[float, Tuple[int, ...], float]:
+    """
+    Força bruta exaustiva distribuída entre núcleos da CPU.
+
+    O espaço de permutações é dividido em shards por prefixos fixos
+    (as `shard_depth` primeiras cidades após a origem), resolvidos em um
+    ProcessPoolExecutor. A matriz de distâncias é enviada uma única vez a
+    cada worker pelo inicializador e usada apenas para leitura. Cada shard
+    devolve sua primeira rota mínima (com custos bit a bit iguais aos de
+    calculate_route_cost, ver _brute_force_from_head) e os shards são
+    reduzidos na ordem lexicográfica dos prefixos, mantendo só mínimos
+    estritamente menores: vence a rota de menor índice global na ordem de
+    solve_tsp_brute_force, inclusive em empates.
+
+    Args:
+        distance_matrix: Matriz de distâncias
+        max_workers: Número de processos (padrão: os.cpu_count())
+        shard_depth: Tamanho do prefixo de cada shard (padrão: o menor que
+            gera pelo menos 4 shards por worker)
+        block_size: Ver solve_tsp_brute_force_vectorized
+        stats: Se fornecido, recebe "routes_evaluated", "shards" e "workers"
+
+    Returns:
+        (custo_ótimo, rota_ótima, tempo_execução)
+    """
+    if block_size < 1:
+        raise ValueError(f"block_size deve ser >= 1 (recebido: {block_size})")
+
+    start_time = time.time()
+    D = np.ascontiguousarray(distance_matrix, dtype=float)
+    n = len(D)
+    workers = max_workers or os.cpu_count() or 1
+
+    # Instâncias pequenas não compensam o custo de criar processos
+    if n - 1 <= block_size or workers == 1:
+        min_cost, best_route, elapsed_time = solve_tsp_brute_force_vectorized(D, block_size, stats)
+        if stats is not None:
+            stats.update(shards=1, workers=1)
+        return min_cost, best_route, time.time() - start_time
+
+    if shard_depth is None:
+        shard_depth = 1
+        n_shards = n - 1
+        while n_shards < 4 * workers and shard_depth < n - 1 - block_size:
+            shard_depth += 1
+            n_shards *= n - shard_depth
+    shard_depth = min(shard_depth, n - 1)
+    shards = list(itertools.permutations(range(1, n), shard_depth))
+
+    min_cost = float('inf')
+    best_route = None
+    evaluated = 0
+
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_brute_force_worker,
+                             initargs=(D,)) as executor:
+        chunksize = max(1, len(shards) // (8 * workers))
+        results = executor.map(_brute_force_shard, shards,
+                               itertools.repeat(block_size), chunksize=chunksize)
+        # executor.map preserva a ordem dos shards; "<" estrito mantém o
+        # primeiro mínimo global
+        for cost, route, count in results:
+            evaluated += count
+            if cost < min_cost:
+                min_cost = cost
+                best_route = route
+
+    if stats is not None:
+        stats.update(routes_evaluated=evaluated, shards=len(shards), workers=workers)
+
+    elapsed_time = time.time() - start_time
+    return min_cost, best_route, elapsed_time
+
+
+def solve_tsp_held_karp(distance_matrix: List[List[float]],
+                        stats: Optional[Dict[str, Any]] = None) -> Tuple[float, Tuple[int, ...], float]:
+    """
+    Resolve TSP de forma exata por programação dinâmica (Held-Karp).
+
+    Complexidade O(n²·2ⁿ) em tempo e O(n·2ⁿ) em memória. As tabelas são
+    indexadas por bitmask (bit k ↔ cidade k + 1; a cidade 0 é o ponto de
+    partida fixo) e preenchidas por camadas de cardinalidade, vetorizando
+    a transição sobre todos os subconjuntos de mesmo tamanho com NumPy.
+
+    Args:
+        distance_matrix: Matriz de distâncias
+        stats: Se fornecido, recebe o contador "dp_states"
+
+    Returns:
+        (custo_ótimo, rota_ótima, tempo_execução) — mesmo formato de
+        solve_tsp_brute_force
+    """
+    start_time = time.time()
+    D = np.asarray(distance_matrix, dtype=float)
+    n = len(D)
+
+    if n <= 2:
+        route = tuple(range(n)) + (0,)
+        if stats is not None:
+            stats["dp_states"] = 0
+        return calculate_route_cost(route, D), route, time.time() - start_time
+
+    m = n - 1                      # Cidades 1..n-1 viram bits 0..m-1
+    full = (1 << m) - 1
+    dp = np.full((1 << m, m), np.inf)
+    parent = np.full((1 << m, m), -1, dtype=np.int8 if m < 127 else np.int16)
+
+    # Caso base: 0 → k
+    singles = 1 << np.arange(m)
+    dp[singles, np.arange(m)] = D[0, 1:]
+
+    # Agrupar máscaras pelo número de bits (ordem topológica da DP)
+    masks = np.arange(1 << m)
+    popcount = np.zeros(1 << m, dtype=np.int64)
+    for k in range(m):
+        popcount += (masks >> k) & 1
+
+    D_inner = D[1:, 1:]  # D_inner[i, j] = custo (i+1) → (j+1)
+    for size in range(2, m + 1):
+        layer = masks[popcount == size]
+        for j in range(m):
+            # Subconjuntos desta camada que terminam na cidade j
+            sel = layer[(layer >> j) & 1 == 1]
+            prev = sel ^ (1 << j)
+            candidates = dp[prev] + D_inner[:, j]  # (|sel|, m)
+            best_i = np.argmin(candidates, axis=1)
+            dp[sel, j] = candidates[np.arange(len(sel)), best_i]
+            parent[sel, j] = best_i
+
+    # Fechar o ciclo: último → 0
+    closing = dp[full] + D[1:, 0]
+    last = int(np.argmin(closing))
+    min_cost = float(closing[last])
+
+    # Reconstruir a rota pelos ponteiros
+    route = []
+    mask = full
+    while last >= 0:
+        route.append(last + 1)
+        prev_last = int(parent[mask, last])
+        mask ^= 1 << last
+        last = prev_last
+    best_route = (0,) + tuple(reversed(route)) + (0,)
+
+    if stats is not None:
+        stats["dp_states"] = int(np.isfinite(dp).sum())
+
+    elapsed_time = time.time() - start_time
+    return min_cost, best_route, elapsed_time
+
+
+def _reduce_matrices(M: np.ndarray) -> np.ndarray:
+    """
+    Reduz (in-place) um lote de matrizes de custo (k, n, n) por linhas e
+    colunas, ignorando linhas/colunas já bloqueadas (todas infinitas).
+
+    Returns:
+        Custo total de redução de cada matriz, shape (k,)
+    """
+    row_min = M.min(axis=2, keepdims=True)
+    row_min[np.isinf(row_min)] = 0.0
+    M -= row_min
+    col_min = M.min(axis=1, keepdims=True)
+    col_min[np.isinf(col_min)] = 0.0
+    M -= col_min
+    return row_min.sum(axis=(1, 2)) + col_min.sum(axis=(1, 2))
+
+
+def solve_tsp_branch_and_bound(distance_matrix: List[List[float]],
+                               stats: Optional[Dict[str, Any]] = None) -> Tuple[float, Tuple[int, ...], float]:
+    """
+    Resolve TSP de forma exata por branch-and-bound em profundidade.
+
+    O limite inferior de cada nó é o da matriz reduzida (Little et al.),
+    válido também para matrizes assimétricas. Os filhos de um nó são
+    gerados e reduzidos em lote com NumPy e visitados em ordem crescente de
+    limite, de modo que o primeiro mergulho já produz uma boa rota
+    incumbente para podar o restante da árvore.
+
+    Args:
+        distance_matrix: Matriz de distâncias
+        stats: Se fornecido, recebe "nodes_explored", "nodes_pruned",
+            "prune_rate" e "incumbent_updates"
+
+    Returns:
+        (custo_ótimo, rota_ótima, tempo_execução)
+    """
+    start_time = time.time()
+    D = np.asarray(distance_matrix, dtype=float)
+    n = len(D)
+
+    counters = {"nodes_explored": 0, "nodes_pruned": 0, "incumbent_updates": 0}
+    best = {"cost": float('inf'), "route": None}
+
+    if n <= 2:
+        route = tuple(range(n)) + (0,)
+        best.update(cost=calculate_route_cost(route, D), route=route)
+    else:
+        root = D.copy()
+        np.fill_diagonal(root, np.inf)
+        root_bound = _reduce_matrices(root[None])[0]
+
+        def expand(M: np.ndarray, bound: float, path: List[int], path_cost: float):
+            counters["nodes_explored"] += 1
+            city = path[-1]
+
+            if len(path) == n:
+                total = path_cost + D[city, 0]
+                if total < best["cost"]:
+                    best.update(cost=total, route=tuple(path) + (0,))
+                    counters["incumbent_updates"] += 1
+                return
+
+            visited = set(path)
+            nxt = np.array([j for j in range(n) if j not in visited])
+            k = len(nxt)
+
+            # Filhos: fixar a aresta city → j em cada matriz do lote
+            children = np.repeat(M[None], k, axis=0)
+            children[:, city, :] = np.inf
+            children[np.arange(k), :, nxt] = np.inf
+            if len(path) + 1 < n:
+                children[np.arange(k), nxt, 0] = np.inf  # Evita subciclo precoce
+            bounds = bound + M[city, nxt] + _reduce_matrices(children)
+
+            for idx in np.argsort(bounds, kind="stable"):
+                if bounds[idx] >= best["cost"]:
+                    counters["nodes_pruned"] += 1
+                    continue
+                j = int(nxt[idx])
+                expand(children[idx], bounds[idx], path + [j], path_cost + D[city, j])
+
+        expand(root, root_bound, [0], 0.0)
+
+    if stats is not None:
+        generated = counters["nodes_explored"] + counters["nodes_pruned"]
+        stats.update(counters)
+        stats["prune_rate"] = counters["nodes_pruned"] / generated if generated else 0.0
+
+    elapsed_time = time.time() - start_time
+    return float(best["cost"]), best["route"], elapsed_time
+
+
+def _nearest_neighbor_tour(D: np.ndarray, start: int = 0) -> List[int]:
+    """Rota gulosa: a partir de `start`, sempre a cidade não visitada mais próxima."""
+    n = len(D)
+    visited = np.zeros(n, dtype=bool)
+    tour = [start]
+    visited[start] = True
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, D[tour[-1]])
+        nxt = int(np.argmin(row))
+        tour.append(nxt)
+        visited[nxt] = True
+    return tour
+
+
+def _greedy_edge_tour(D: np.ndarray) -> List[int]:
+    """
+    Rota pela heurística de arestas gulosas (versão dirigida).
+
+    Arestas i→j em ordem crescente de custo são aceitas se i ainda não tem
+    sucessor, j ainda não tem antecessor e a aresta não fecha um ciclo
+    antes da hora. Vale para matrizes assimétricas.
+    """
+    n = len(D)
+    succ = [-1] * n
+    pred = [-1] * n
+    parent = list(range(n))
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    order = np.argsort(D, axis=None, kind='stable')
+    added = 0
+    for flat in order:
+        i, j = divmod(int(flat), n)
+        if i == j or succ[i] != -1 or pred[j] != -1:
+            continue
+        ri, rj = find(i), find(j)
+        if ri == rj:
+            continue
+        succ[i], pred[j] = j, i
+        parent[ri] = rj
+        added += 1
+        if added == n - 1:
+            break
+
+    # Fecha o caminho hamiltoniano: fim (sem sucessor) → início (sem antecessor)
+    head = pred.index(-1)
+    tour = [head]
+    while succ[tour[-1]] != -1:
+        tour.append(succ[tour[-1]])
+    return tour
+
+
+def _neighbor_lists(D: np.ndarray, k: int) -> List[List[int]]:
+    """As k cidades mais próximas de cada cidade, por min(D[i,j], D[j,i])."""
+    n = len(D)
+    k = max(1, min(k, n - 1))
+    M = np.minimum(D, D.T).astype(float)
+    np.fill_diagonal(M, np.inf)
+    return np.argsort(M, axis=1, kind='stable')[:, :k].tolist()
+
+
+def _local_search(D: np.ndarray, tour: List[int], neighbors: List[List[int]],
+                  or_opt: bool = True, max_moves: int = 1_000_000) -> Tuple[List[int], int, int]:
+    """
+    Busca local 2-opt + Or-opt com listas de vizinhos e don't-look bits.
+
+    A posição 0 da rota fica fixa. Inverter um trecho muda o sentido das
+    arestas internas; em matrizes assimétricas essa diferença entra no
+    delta via somas de prefixo nos dois sentidos (F e R), em O(1) por
+    movimento avaliado.
+
+    Returns:
+        (rota, movimentos_2opt, movimentos_oropt)
+    """
+    n = len(tour)
+    Dl = D.tolist()
+    tour = list(tour)
+    pos = [0] * n
+    eps = 1e-10
+
+    def refresh():
+        for idx, city in enumerate(tour):
+            pos[city] = idx
+        t = np.asarray(tour)
+        F = np.concatenate([[0.0], np.cumsum(D[t[:-1], t[1:]])]).tolist()
+        R = np.concatenate([[0.0], np.cumsum(D[t[1:], t[:-1]])]).tolist()
+        return F, R
+
+    F, R = refresh()
+    queue = list(range(n))
+    queued = [True] * n
+    two_opt_moves = or_opt_moves = 0
+
+    def activate(*cities):
+        for city in cities:
+            if not queued[city]:
+                queued[city] = True
+                queue.append(city)
+
+    def two_opt_delta(lo: int, hi: int) -> float:
+        a, b, c, d = tour[lo], tour[lo + 1], tour[hi], tour[(hi + 1) % n]
+        return (Dl[a][c] + Dl[b][d] - Dl[a][b] - Dl[c][d]
+                + (R[hi] - R[lo + 1]) - (F[hi] - F[lo + 1]))
+
+    def try_two_opt(a: int) -> bool:
+        nonlocal F, R, two_opt_moves
+        i = pos[a]
+        for c in neighbors[a]:
+            j = pos[c]
+            lo, hi = min(i, j), max(i, j)
+            for l, h in ((lo, hi), (lo - 1, hi - 1)):
+                if l < 0 or h - l < 2:
+                    continue
+                if two_opt_delta(l, h) < -eps:
+                    ends = (tour[l], tour[l + 1], tour[h], tour[(h + 1) % n])
+                    tour[l + 1:h + 1] = tour[l + 1:h + 1][::-1]
+                    F, R = refresh()
+                    two_opt_moves += 1
+                    activate(*ends)
+                    return True
+        return False
+
+    def try_or_opt(a: int) -> bool:
+        nonlocal F, R, or_opt_moves
+        s = pos[a]
+        if s == 0:
+            return False
+        for length in (1, 2, 3):
+            e = s + length - 1
+            if e >= n:
+                break
+            first, last = tour[s], tour[e]
+            prev, nxt = tour[s - 1], tour[(e + 1) % n]
+            removed_gain = Dl[prev][first] + Dl[last][nxt] - Dl[prev][nxt]
+            reverse_extra = (R[e] - R[s]) - (F[e] - F[s])
+            for endpoint in (first, last):
+                for c in neighbors[endpoint]:
+                    pc = pos[c]
+                    if s <= pc <= e or c == prev:
+                        continue
+                    c_next = tour[(pc + 1) % n]
+                    base = -removed_gain - Dl[c][c_next]
+                    forward = base + Dl[c][first] + Dl[last][c_next]
+                    backward = base + Dl[c][last] + Dl[first][c_next] + reverse_extra
+                    if min(forward, backward) < -eps:
+                        segment = tour[s:e + 1]
+                        if backward < forward:
+                            segment = segment[::-1]
+                        rest = tour[:s] + tour[e + 1:]
+                        k = rest.index(c) + 1
+                        tour[:] = rest[:k] + segment + rest[k:]
+                        F, R = refresh()
+                        or_opt_moves += 1
+                        activate(prev, nxt, first, last, c, c_next)
+                        return True
+        return False
+
+    while queue and two_opt_moves + or_opt_moves < max_moves:
+        a = queue.pop()
+        queued[a] = False
+        if try_two_opt(a) or (or_opt and try_or_opt(a)):
+            activate(a)
+
+    return tour, two_opt_moves, or_opt_moves
+
+
+def solve_tsp_heuristic(distance_matrix: List[List[float]],
+                        construction: str = "nearest_neighbor",
+                        neighbors: int = 10,
+                        or_opt: bool = True,
+                        stats: Optional[Dict[str, Any]] = None) -> Tuple[float, Tuple[int, ...], float]:
+    """
+    Resolve TSP de forma aproximada: construção gulosa + busca local.
+
+    Não garante o ótimo, mas dá um limite superior em frações de segundo
+    para centenas de cidades, muito além do alcance dos solvers exatos.
+    A heurística mira instâncias simétricas. Em matrizes assimétricas os
+    deltas continuam exatos (ver _local_search), mas 2-opt e Or-opt
+    invertem trechos e param em ótimos locais fracos: em instâncias
+    aleatórias de 10 cidades a diferença para o ótimo chega a ~45%.
+
+    Args:
+        distance_matrix: Matriz de distâncias
+        construction: "nearest_neighbor" ou "greedy" (arestas gulosas)
+        neighbors: Tamanho das listas de vizinhos candidatos
+        or_opt: Se True, aplica Or-opt (trechos de 1 a 3 cidades) além do 2-opt
+        stats: Se fornecido, recebe "construction_cost", "two_opt_moves"
+            e "or_opt_moves"
+
+    Returns:
+        (custo, rota, tempo_execução)
+    """
+    start_time = time.time()
+    D = np.asarray(distance_matrix, dtype=float)
+    n = len(D)
+
+    if construction == "nearest_neighbor":
+        tour = _nearest_neighbor_tour(D)
+    elif construction == "greedy":
+        tour = _greedy_edge_tour(D)
+    else:
+        raise ValueError(f"Construção desconhecida: {construction} (use 'nearest_neighbor' ou 'greedy')")
+
+    # Rotação para começar na cidade 0, como nos solvers exatos
+    start = tour.index(0)
+    tour = tour[start:] + tour[:start]
+    construction_cost = calculate_route_cost(tuple(tour) + (0,), D)
+
+    two_opt_moves = or_opt_moves = 0
+    if n > 3:
+        tour, two_opt_moves, or_opt_moves = _local_search(D, tour, _neighbor_lists(D, neighbors), or_opt)
+    elif n == 3:
+        # Só há duas rotas (os dois sentidos); em matrizes assimétricas elas diferem
+        reverse = [tour[0]] + tour[:0:-1]
+        if calculate_route_cost(tuple(reverse) + (0,), D) < calculate_route_cost(tuple(tour) + (0,), D):
+            tour = reverse
+            two_opt_moves = 1
+
+    route = tuple(tour) + (0,)
+    cost = float(calculate_route_cost(route, D))
+
+    if stats is not None:
+        stats["construction_cost"] = float(construction_cost)
+        stats["two_opt_moves"] = two_opt_moves
+        stats["or_opt_moves"] = or_opt_moves
+
+    elapsed_time = time.time() - start_time
+    return cost, route, elapsed_time
+
+
+# Solvers clássicos selecionáveis em main()
+CLASSICAL_SOLVERS = {
+    "brute_force": solve_tsp_brute_force,
+    "brute_force_vectorized": solve_tsp_brute_force_vectorized,
+    "brute_force_parallel": solve_tsp_brute_force_parallel,
+    "held_karp": solve_tsp_held_karp,
+    "branch_and_bound": solve_tsp_branch_and_bound,
+    "heuristic": solve_tsp_heuristic,
+}
+
+
+# ============================================================================
+# 3. FUNÇÕES QUÂNTICAS (QAOA)
+# ============================================================================
+
+def interpret_tsp_solution(x_array: np.ndarray, n_cities: int) -> Tuple[int, ...]:
+    """
+    Decodifica a solução binária do QAOA em uma rota TSP.
+    
+    A codificação é: x[i*n + t] representa se a cidade i está na posição t da rota.
+    """
+    try:
+        route = []
+        for t in range(n_cities):
+            for i in range(n_cities):
+                if x_array[i * n_cities + t] >= 0.5:  # Threshold para arredondar
+                    route.append(i)
+                    break
+        
+        # Validar se é uma rota válida
+        if len(set(route)) == n_cities and len(route) == n_cities:
+            return tuple(route) + (route[0],)
+        else:
+            return None
+    except Exception as e:
+        print(f"Erro na decodificação: {e}")
+        return None
+
+
+@contextmanager
+def _profile_stage(profile: Optional[Dict[str, Any]], name: str):
+    """
+    Mede tempo (perf_counter) e pico de memória (tracemalloc) de uma etapa.
+
+    Com profile=None não faz nada. O pico é zerado no início da etapa e
+    reportado acima da memória já alocada na entrada, então cada valor
+    reflete apenas as alocações da própria etapa, e não o que as etapas
+    anteriores ainda mantêm.
+    """
+    if profile is None:
+        yield
+        return
+    tracemalloc.reset_peak()
+    start_memory, _ = tracemalloc.get_traced_memory()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        profile["stages"][name] = {"time": time.perf_counter() - t0,
+                                   "peak_memory_bytes": int(peak - start_memory)}
+
+
+def solve_tsp_qaoa(distance_matrix: List[List[float]], 
+                   p: int = 1,
+                   maxiter: int = 100,
+                   seed: int = 42,
+                   cache_dir: Optional[str] = None,
+                   profile: bool = False,
+                   encoding: str = "one_hot",
+                   penalty: Any = None) -> Dict[str, Any]:
+    """
+    Resolve TSP usando QAOA (Quantum Approximate Optimization Algorithm).
+    
+    Args:
+        distance_matrix: Matriz de distâncias
+        p: Número de camadas do QAOA (reps)
+        maxiter: Iterações máximas do otimizador clássico
+        seed: Seed para reprodutibilidade
+        cache_dir: Diretório do cache de soluções (ex.: CACHE_DIR);
+            None desativa. Só execuções bem-sucedidas são gravadas; em um
+            acerto o resultado original volta com "cached": True
+        profile: Se True, ignora a leitura do cache e adiciona "profile"
+            ao resultado: tempo e pico de memória por etapa ("qubo",
+            "setup", "solve", "decode"), avaliações da função objetivo,
+            chamadas ao sampler e a divisão do tempo de "solve" entre
+            simulação ("sampler_time") e o restante ("optimizer_overhead_time").
+            O "profile" não é gravado no cache
+        encoding: "one_hot" (Tsp do qiskit_optimization, n² qubits) ou
+            "fixed_start" (build_tsp_qubo_fixed_start, (n-1)² qubits)
+        penalty: Fator A: None (padrão: "bound", tsp_penalty_bound com
+            margem), um número, "bound" ou "pilot" (tune_penalty). Em
+            "one_hot" é a penalidade das restrições na conversão para QUBO
+            (MinimumEigenOptimizer); o valor usado volta em "penalty" e a
+            origem em "penalty_method"
+        
+    Returns:
+        Dicionário com resultados, circuito, e tempos
+    """
+    if cache_dir is not None:
+        key = solution_cache_key(distance_matrix, "qaoa", p=p, maxiter=maxiter,
+                                 seed=seed, backend="StatevectorSampler", encoding=encoding,
+                                 penalty=penalty)
+        cached = cache_get(cache_dir, key) if not profile else None
+        if cached is not None:
+            return dict(cached, cached=True)
+    
+    if not QISKIT_AVAILABLE:
+        return {"error": "Qiskit não disponível"}
+    
+    start_time = time.time()
+    n_cities = len(distance_matrix)
+    
+    prof = None
+    started_tracing = False
+    if profile:
+        prof = {"stages": {}, "objective_evaluations": 0, "sampler_calls": 0, "sampler_pubs": 0,
+                "sampler_time": 0.0}
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+    
+    try:
+        # Criar problema TSP
+        with _profile_stage(prof, "qubo"):
+            A, penalty_method = _resolve_penalty(distance_matrix, "bound" if penalty is None else penalty,
+                                                 encoding, p=p)
+            if encoding == "one_hot":
+                tsp_problem = Tsp(distance_matrix)
+                qubo = tsp_problem.to_quadratic_program()
+            elif encoding == "fixed_start":
+                Q, offset, _ = build_tsp_qubo_fixed_start(distance_matrix, penalty=A)
+                qubo = QuadraticProgram("tsp_fixed_start")
+                for k in range(len(Q)):
+                    qubo.binary_var(f"x_{k}")
+                a, b = np.nonzero(np.triu(Q, 1))
+                qubo.minimize(constant=offset, linear=np.diag(Q),
+                              quadratic={(int(i), int(j)): float(Q[i, j]) for i, j in zip(a, b)})
+            else:
+                raise ValueError(f"Codificação não suportada pelo Qiskit QAOA: {encoding}")
+        
+        # Configurar QAOA
+        with _profile_stage(prof, "setup"):
+            sampler = StatevectorSampler(seed=seed)
+            optimizer = COBYLA(maxiter=maxiter, tol=1e-5)
+            callback = None
+            if prof is not None:
+                sampler_run = sampler.run
+                
+                def counted_run(pubs, *args, **kwargs):
+                    prof["sampler_calls"] += 1
+                    prof["sampler_pubs"] += len(pubs)
+                    t0 = time.perf_counter()
+                    job = sampler_run(pubs, *args, **kwargs)
+                    # O job executa em outra thread: o tempo de simulação vai
+                    # do envio até o primeiro result() retornar
+                    job_result = job.result
+                    pending = [True]
+                    
+                    def timed_result():
+                        value = job_result()
+                        if pending:
+                            prof["sampler_time"] += time.perf_counter() - t0
+                            pending.clear()
+                        return value
+                    
+                    job.result = timed_result
+                    return job
+                
+                def callback(eval_count, parameters, value, metadata):
+                    prof["objective_evaluations"] = eval_count
+                
+                sampler.run = counted_run
+            qaoa = QAOA(sampler=sampler, optimizer=optimizer, reps=p, callback=callback)
+        
+        # Executar otimização
+        with _profile_stage(prof, "solve"):
+            meo = MinimumEigenOptimizer(qaoa, penalty=A)
+            result = meo.solve(qubo)
+        if prof is not None:
+            prof["optimizer_overhead_time"] = prof["stages"]["solve"]["time"] - prof["sampler_time"]
+        
+        # Decodificar resultado
+        with _profile_stage(prof, "decode"):
+            if encoding == "one_hot":
+                route = interpret_tsp_solution(result.x, n_cities)
+            else:
+                state = sum(1 << k for k, bit in enumerate(result.x) if bit >= 0.5)
+                route = decode_state(state, n_cities, encoding)
+            cost = result.fval if route else float('inf')
+        
+        elapsed_time = time.time() - start_time
+        
+        output = {
+            "success": True,
+            "route": route,
+            "cost": float(cost),
+            "time": elapsed_time,
+            "iterations": optimizer.settings.get("maxiter", maxiter),
+            "fval": float(result.fval),
+            "x": result.x,
+            "penalty": A,
+            "penalty_method": penalty_method,
+        }
+        if prof is not None:
+            output["profile"] = prof
+        if cache_dir is not None:
+            cache_put(cache_dir, key, {k: v for k, v in output.items() if k != "profile"})
+            output["cached"] = False
+        return output
+        
+    except Exception as e:
+        elapsed_time = time.time() - start_time
+        print(f"❌ Erro QAOA ({n_cities} cidades): {type(e).__name__}: {str(e)[:100]}")
+        output = {
+            "success": False,
+            "error": str(e),
+            "time": elapsed_time
+        }
+        if prof is not None:
+            output["profile"] = prof
+        return output
+    
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+
+
+# ============================================================================
+# 3.1 HAMILTONIANO DE ISING VETORIZADO (FORMULAÇÃO ONE-HOT DOS NOTEBOOKS)
+# ============================================================================
+
+def build_tsp_ising(distance_matrix: List[List[float]],
+                    penalty: Optional[float] = None,
+                    penalty_multiplier: float = 2.0) -> Dict[str, Any]:
+    """
+    Constrói o Hamiltoniano de Ising do TSP em arrays COO.
+
+    Mesma formulação de construir_hamiltoniano_tsp dos notebooks
+    (x_{i,t} → qubit i*n + t, x = (1 - Z)/2, H = H_dist + A·H_p1 + A·H_p2),
+    mas gerada por broadcasting a partir da matriz de distâncias, sem laços
+    aninhados nem dicionários:
+
+        E(z) = offset + Σ_q h_q z_q + Σ_k J_k z_{a_k} z_{b_k}
+
+    Para rotas válidas E(z) é exatamente o custo da rota.
+
+    Args:
+        distance_matrix: Matriz de distâncias
+        penalty: Fator de penalidade A (padrão: penalty_multiplier·max(D)·n)
+        penalty_multiplier: Usado apenas quando penalty não é informado
+
+    Returns:
+        Dicionário com "h" (n²,), "J_indices" (k, 2) com a < b,
+        "J_coeffs" (k,), "offset", "penalty", "n_cities" e "num_qubits"
+    """
+    D = np.asarray(distance_matrix, dtype=float)
+    n = len(D)
+    N = n * n
+    A = float(penalty) if penalty is not None else penalty_multiplier * float(np.max(D)) * n
+
+    # H_dist: d_ij · x_{i,t} · x_{j,t+1}
+    i, j, t = (a.ravel() for a in np.meshgrid(np.arange(n), np.arange(n), np.arange(n), indexing='ij'))
+    off_diag = i != j
+    i, j, t = i[off_diag], j[off_diag], t[off_diag]
+    dist_a = i * n + t
+    dist_b = j * n + (t + 1) % n
+    dist_w = D[i, j] / 4
+
+    # H_p1 / H_p2: pares (i,t)-(i,t2) e (i,t)-(i2,t), cada um com peso A/2
+    u, v = np.triu_indices(n, 1)
+    rows = np.arange(n)[:, None] * n
+    row_a = (rows + u).ravel()
+    row_b = (rows + v).ravel()
+    cols = np.arange(n)[:, None]
+    col_a = (u * n + cols).ravel()
+    col_b = (v * n + cols).ravel()
+
+    qa = np.concatenate([dist_a, row_a, col_a])
+    qb = np.concatenate([dist_b, row_b, col_b])
+    w = np.concatenate([dist_w, np.full(len(row_a) + len(col_a), A / 2)])
+
+    # x_a·x_b = (1 - Z_a - Z_b + Z_a Z_b)/4 → cada par contribui com
+    # -w para h_a e h_b, +w para J_ab e +w para a constante
+    h = A - np.bincount(qa, weights=w, minlength=N) - np.bincount(qb, weights=w, minlength=N)
+    offset = float(w.sum()) + 2 * n * A * (1 - n / 2)
+
+    lo = np.minimum(qa, qb)
+    hi = np.maximum(qa, qb)
+    keys, inverse = np.unique(lo * N + hi, return_inverse=True)
+    coeffs = np.bincount(inverse, weights=w)
+    nonzero = np.abs(coeffs) > 1e-10
+    keys, coeffs = keys[nonzero], coeffs[nonzero]
+
+    return {
+        "h": h,
+        "J_indices": np.stack([keys // N, keys % N], axis=1),
+        "J_coeffs": coeffs,
+        "offset": offset,
+        "penalty": A,
+        "n_cities": n,
+        "num_qubits": N,
+    }
+
+
+def ising_coupling_matrix(model: Dict[str, Any], sparse: bool = True):
+    """
+    Forma matricial (triangular superior, N×N) dos acoplamentos J.
+
+    Args:
+        model: Saída de build_tsp_ising
+        sparse: Se True retorna scipy.sparse.coo_matrix; senão np.ndarray
+
+    Returns:
+        Matriz J tal que Σ_k J_k z_a z_b = zᵀ J z
+    """
+    N = model["num_qubits"]
+    a, b = model["J_indices"].T
+    if not sparse:
+        J = np.zeros((N, N))
+        J[a, b] = model["J_coeffs"]
+        return J
+    if not SCIPY_AVAILABLE:
+        raise ImportError("SciPy não disponível para a forma esparsa do Hamiltoniano")
+    return scipy.sparse.coo_matrix((model["J_coeffs"], (a, b)), shape=(N, N))
+
+
+def ising_to_dicts(model: Dict[str, Any]) -> Tuple[Dict[int, float], Dict[Tuple[int, int], float]]:
+    """
+    Converte o modelo em (h, J) no formato de dicionários dos notebooks,
+    compatível com qaoa_layer/qaoa_circuit.
+    """
+    h = {q: float(c) for q, c in enumerate(model["h"])}
+    J = {(int(a), int(b)): float(c) for (a, b), c in zip(model["J_indices"], model["J_coeffs"])}
+    return h, J
+
+
+# Codificações disponíveis para o registrador do QAOA:
+#   "one_hot":     x_{i,t} para todas as cidades e tempos, n² qubits
+#   "fixed_start": cidade 0 fixa no tempo 0, x_{i,t} com i,t ≥ 1, (n-1)² qubits
+#   "binary":      cidade 0 fixa; em cada tempo t ≥ 1 um registrador de
+#                  ⌈log2(n-1)⌉ bits com o índice da cidade, (n-1)·⌈log2(n-1)⌉ qubits
+ENCODINGS = ("one_hot", "fixed_start", "binary")
+
+
+def _binary_code_width(n: int) -> int:
+    """Bits por tempo na codificação binária: ⌈log2(n-1)⌉ (mínimo 1)."""
+    return max(1, (n - 2).bit_length())
+
+
+def encoding_num_qubits(n: int, encoding: str = "one_hot") -> int:
+    """Número de qubits da codificação para n cidades."""
+    if encoding == "one_hot":
+        return n * n
+    if encoding == "fixed_start":
+        return (n - 1) ** 2
+    if encoding == "binary":
+        return (n - 1) * _binary_code_width(n)
+    raise ValueError(f"Codificação desconhecida: {encoding} (use um de {ENCODINGS})")
+
+
+def build_tsp_qubo_fixed_start(distance_matrix: List[List[float]],
+                               penalty: Optional[float] = None,
+                               penalty_multiplier: float = 2.0) -> Tuple[np.ndarray, float, float]:
+    """
+    QUBO do TSP com a cidade 0 fixa no tempo 0.
+
+    Variáveis x_{i,t} para i, t ∈ {1..n-1}, no qubit (i-1)(n-1) + (t-1).
+    As arestas que saem/chegam na cidade 0 viram termos lineares em
+    x_{i,1} e x_{i,n-1}; as penalidades A(1 - Σ x)² valem para cada
+    cidade e cada tempo restantes. Para rotas válidas E(x) é o custo.
+
+    Returns:
+        (Q triangular superior (N, N), offset, penalty)
+    """
+    D = np.asarray(distance_matrix, dtype=float)
+    n = len(D)
+    m = n - 1
+    N = m * m
+    A = float(penalty) if penalty is not None else penalty_multiplier * float(np.max(D)) * n
+    var = np.arange(N).reshape(m, m)  # var[i-1, t-1]
+
+    Q = np.zeros((N, N))
+    # 0 → i no tempo 1 e i → 0 depois do tempo n-1
+    Q[var[:, 0], var[:, 0]] += D[0, 1:]
+    Q[var[:, -1], var[:, -1]] += D[1:, 0]
+
+    # i → j entre os tempos t e t+1
+    if m > 1:
+        i, j, t = (a.ravel() for a in np.meshgrid(np.arange(m), np.arange(m), np.arange(m - 1), indexing='ij'))
+        off_diag = i != j
+        i, j, t = i[off_diag], j[off_diag], t[off_diag]
+        np.add.at(Q, (var[i, t], var[j, t + 1]), D[i + 1, j + 1])
+
+    # A(1 - Σ x)² = A - A Σ x + 2A Σ_{a<b} x_a x_b, para linhas e colunas
+    Q[np.arange(N), np.arange(N)] -= 2 * A
+    u, v = np.triu_indices(m, 1)
+    np.add.at(Q, (var[:, u].ravel(), var[:, v].ravel()), 2 * A)
+    np.add.at(Q, (var[u, :].ravel(), var[v, :].ravel()), 2 * A)
+
+    Q = np.triu(Q) + np.tril(Q, -1).T
+    return Q, 2 * m * A, A
+
+
+def build_tsp_binary_model(distance_matrix: List[List[float]],
+                           penalty: Optional[float] = None,
+                           penalty_multiplier: float = 2.0) -> Dict[str, Any]:
+    """
+    Modelo do TSP na codificação binária (log) com a cidade 0 fixa.
+
+    O registrador do tempo t (bits (t-1)·w .. t·w - 1) guarda o código
+    c = cidade - 1. O Hamiltoniano não é quadrático nessa codificação, então
+    o modelo traz a diagonal completa de H_C:
+
+        E(z) = custo da sequência (códigos inválidos limitados a n-2)
+               + A · (n-1 - número de cidades distintas válidas)
+
+    Rotas válidas têm E(z) igual ao custo; toda violação custa A a mais.
+
+    Returns:
+        Dicionário com "diagonal" (2^N,), "h"/"J_indices"/"J_coeffs" vazios,
+        "offset" = 0, "penalty", "n_cities", "num_qubits" e "encoding"
+    """
+    D = np.asarray(distance_matrix, dtype=float)
+    n = len(D)
+    m = n - 1
+    w = _binary_code_width(n)
+    N = m * w
+    A = float(penalty) if penalty is not None else penalty_multiplier * float(np.max(D)) * n
+
+    states = np.arange(1 << N, dtype=np.int64)
+    codes = (states[:, None] >> (w * np.arange(m))) & ((1 << w) - 1)
+    cities = np.minimum(codes, m - 1) + 1
+
+    diag = D[0, cities[:, 0]] + D[cities[:, -1], 0]
+    if m > 1:
+        diag += D[cities[:, :-1], cities[:, 1:]].sum(axis=1)
+
+    in_range = codes < m
+    present = np.zeros(len(states), dtype=np.int64)
+    for c in range(m):
+        present += ((codes == c) & in_range).any(axis=1)
+    diag += A * (m - present)
+
+    return {
+        "diagonal": diag,
+        "h": np.zeros(N),
+        "J_indices": np.zeros((0, 2), dtype=np.int64),
+        "J_coeffs": np.zeros(0),
+        "offset": 0.0,
+        "penalty": A,
+        "n_cities": n,
+        "num_qubits": N,
+        "encoding": "binary",
+    }
+
+
+def build_tsp_model(distance_matrix: List[List[float]],
+                    encoding: str = "one_hot",
+                    penalty: Optional[float] = None,
+                    penalty_multiplier: float = 2.0) -> Dict[str, Any]:
+    """
+    Constrói o modelo do TSP na codificação escolhida.
+
+    "one_hot" é build_tsp_ising; "fixed_start" converte
+    build_tsp_qubo_fixed_start com qubo_to_ising; "binary" é
+    build_tsp_binary_model (apenas diagonal, sem forma de Ising).
+
+    Returns:
+        Dicionário no formato de build_tsp_ising, com a chave "encoding"
+    """
+    if encoding == "one_hot":
+        model = build_tsp_ising(distance_matrix, penalty, penalty_multiplier)
+    elif encoding == "fixed_start":
+        Q, offset, A = build_tsp_qubo_fixed_start(distance_matrix, penalty, penalty_multiplier)
+        model = qubo_to_ising(Q, offset)
+        model.update(penalty=A, n_cities=len(distance_matrix))
+    elif encoding == "binary":
+        return build_tsp_binary_model(distance_matrix, penalty, penalty_multiplier)
+    else:
+        raise ValueError(f"Codificação desconhecida: {encoding} (use um de {ENCODINGS})")
+    model["encoding"] = encoding
+    return model
+
+
+# ============================================================================
+# 3.2 DECODIFICAÇÃO DAS MEDIÇÕES
+# ============================================================================
+
+# Até este número de cidades as n! codificações válidas ficam em tabela
+LOOKUP_TABLE_MAX_CITIES = 8
+
+
+def decode_state(state: int, n: int, encoding: str = "one_hot") -> Optional[Tuple[int, ...]]:
+    """
+    Decodifica um estado inteiro (bit i*n + t ↔ x_{i,t}) em rota TSP.
+
+    Usa apenas operações de bits: cada linha (cidade) de n bits precisa ser
+    uma potência de 2 (exatamente um tempo), e o OU de todas as linhas
+    precisa cobrir os n tempos. Nas codificações "fixed_start" e "binary"
+    (ver ENCODINGS) a rota começa na cidade 0.
+
+    Returns:
+        Rota fechada ou None se o estado viola as restrições
+    """
+    if encoding == "fixed_start":
+        route = decode_state(state, n - 1)
+        return (0,) + tuple(c + 1 for c in route[:-1]) + (0,) if route is not None else None
+    if encoding == "binary":
+        w = _binary_code_width(n)
+        codes = [(state >> (w * t)) & ((1 << w) - 1) for t in range(n - 1)]
+        if len(set(codes)) != n - 1 or max(codes) >= n - 1:
+            return None
+        return (0,) + tuple(c + 1 for c in codes) + (0,)
+    if encoding != "one_hot":
+        raise ValueError(f"Codificação desconhecida: {encoding} (use um de {ENCODINGS})")
+
+    row_mask = (1 << n) - 1
+    seen = 0
+    route = [0] * n
+    for i in range(n):
+        row = (state >> (i * n)) & row_mask
+        if row == 0 or row & (row - 1):
+            return None
+        seen |= row
+        route[row.bit_length() - 1] = i
+    if seen != row_mask:
+        return None
+    return tuple(route) + (route[0],)
+
+
+def decode_bitstring(bitstring: str, n: int, encoding: str = "one_hot") -> Tuple[Optional[Tuple[int, ...]], bool]:
+    """
+    Decodifica uma bitstring (bitstring[q] = qubit q) em rota TSP.
+
+    Returns:
+        (rota fechada ou None, válida)
+    """
+    route = decode_state(int(bitstring[::-1], 2), n, encoding)
+    return route, route is not None
+
+
+@lru_cache(maxsize=None)
+def permutation_states(n: int, encoding: str = "one_hot") -> Tuple[np.ndarray, np.ndarray]:
+    """
+    As codificações válidas, em ordem crescente de estado: n! em "one_hot",
+    (n-1)! (cidade 0 fixa no tempo 0) em "fixed_start" e "binary".
+
+    Returns:
+        (states uint64, perms (k, n)) com perms[k, t] = cidade no tempo t
+        do estado states[k]
+    """
+    if encoding == "one_hot":
+        perms = _index_permutations(n)
+        states = (np.uint64(1) << (perms * n + np.arange(n)).astype(np.uint64)).sum(axis=1, dtype=np.uint64)
+    else:
+        m = n - 1
+        rest = _index_permutations(m)  # rest[k, t-1] = cidade - 1 no tempo t
+        if encoding == "fixed_start":
+            shifts = rest * m + np.arange(m)
+            states = (np.uint64(1) << shifts.astype(np.uint64)).sum(axis=1, dtype=np.uint64)
+        elif encoding == "binary":
+            shifts = (_binary_code_width(n) * np.arange(m)).astype(np.uint64)
+            states = (rest.astype(np.uint64) << shifts).sum(axis=1, dtype=np.uint64)
+        else:
+            raise ValueError(f"Codificação desconhecida: {encoding} (use um de {ENCODINGS})")
+        perms = np.column_stack([np.zeros(len(rest), dtype=rest.dtype), rest + 1])
+    order = np.argsort(states)
+    return states[order], perms[order]
+
+
+@lru_cache(maxsize=32)
+def _cost_table(matrix_bytes: bytes, n: int, encoding: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    D = np.frombuffer(matrix_bytes, dtype=float).reshape(n, n)
+    states, perms = permutation_states(n, encoding)
+    routes = np.column_stack([perms, perms[:, 0]])
+    return states, calculate_route_costs(routes, D), routes
+
+
+def tsp_cost_table(distance_matrix: List[List[float]],
+                   encoding: str = "one_hot") -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Tabela das codificações válidas: (states ordenados, custos, rotas).
+
+    Construída uma vez por matriz e codificação (cache interno); um estado
+    é válido se e somente se aparece em `states` (busca binária com
+    np.searchsorted).
+    """
+    D = np.ascontiguousarray(distance_matrix, dtype=float)
+    return _cost_table(D.tobytes(), len(D), encoding)
+
+
+def tsp_cost_lookup(distance_matrix: List[List[float]],
+                    encoding: str = "one_hot") -> Dict[int, Tuple[float, Tuple[int, ...]]]:
+    """
+    Tabela estado → (custo, rota) das codificações válidas, para
+    consultas avulsas por inteiro; estados ausentes são inválidos.
+    """
+    states, costs, routes = tsp_cost_table(distance_matrix, encoding)
+    return {int(s): (float(c), tuple(r)) for s, c, r in zip(states, costs, routes.tolist())}
+
+
+def counts_to_arrays(data: Any) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converte resultados de medição em arrays paralelos (estados, contagens).
+
+    Aceita:
+        - dict de contagens com chaves bitstring do Qiskit ("0101", com ou
+          sem espaços), hexadecimais ("0x5") ou inteiros
+        - BitArray do SamplerV2 (ex.: pub_result.data.meas), sem passar por
+          strings
+        - memória por shot: lista de bitstrings (Aer get_memory()) ou array
+          de inteiros
+
+    Returns:
+        (states uint64, counts int64); para dicts a ordem das chaves é
+        preservada, para memória os estados saem únicos e ordenados
+
+    Raises:
+        ValueError: Se o registrador tem mais de 64 bits (use
+            counts_to_python_ints)
+    """
+    too_wide = "Registrador com mais de 64 bits não cabe em uint64; use counts_to_python_ints"
+    if isinstance(data, dict):
+        keys = list(data.keys())
+        if keys and isinstance(keys[0], str):
+            states = [int(k, 16) if k.startswith("0x") else int(k.replace(" ", ""), 2) for k in keys]
+        else:
+            states = [int(k) for k in keys]
+        if states and max(states).bit_length() > 64:
+            raise ValueError(too_wide)
+        return (np.array(states, dtype=np.uint64).reshape(-1),
+                np.array(list(data.values()), dtype=np.int64).reshape(-1))
+
+    if hasattr(data, "num_bits") and hasattr(data, "array"):
+        if data.num_bits > 64:
+            raise ValueError(too_wide)
+        # BitArray: bytes big-endian por shot, shape (..., shots, num_bytes)
+        raw = np.asarray(data.array, dtype=np.uint64).reshape(-1, data.array.shape[-1])
+        shifts = np.uint64(8) * np.arange(raw.shape[1] - 1, -1, -1, dtype=np.uint64)
+        shots = (raw << shifts).sum(axis=1, dtype=np.uint64)
+    elif len(data) and isinstance(data[0], str):
+        memory = [m.replace(" ", "") for m in data]
+        if memory[0].startswith("0x"):
+            values = [int(m, 16) for m in memory]
+            if max(values).bit_length() > 64:
+                raise ValueError(too_wide)
+            shots = np.array(values, dtype=np.uint64)
+        else:
+            if len(memory[0]) > 64:
+                raise ValueError(too_wide)
+            bits = np.frombuffer("".join(memory).encode(), dtype=np.uint8).reshape(len(memory), -1) - ord("0")
+            weights = np.uint64(1) << np.arange(bits.shape[1] - 1, -1, -1, dtype=np.uint64)
+            shots = (bits.astype(np.uint64) * weights).sum(axis=1, dtype=np.uint64)
+    else:
+        shots = np.asarray(data, dtype=np.uint64)
+
+    states, counts = np.unique(shots, return_counts=True)
+    return states, counts.astype(np.int64)
+
+
+def counts_to_python_ints(data: Any) -> List[Tuple[int, int]]:
+    """
+    Como counts_to_arrays, mas com estados como int do Python, sem o
+    limite de 64 bits de uint64 (registradores de n² > 64 qubits).
+
+    Returns:
+        Lista de (estado, contagem); para dicts na ordem das chaves, para
+        memória/BitArray com estados únicos e ordenados
+    """
+    if isinstance(data, dict):
+        return [(int(k, 16) if k.startswith("0x") else int(k.replace(" ", ""), 2), int(c))
+                if isinstance(k, str) else (int(k), int(c))
+                for k, c in data.items()]
+
+    if hasattr(data, "num_bits") and hasattr(data, "array"):
+        raw = np.asarray(data.array, dtype=np.uint8).reshape(-1, data.array.shape[-1])
+        shots = [int.from_bytes(row.tobytes(), "big") for row in raw]
+    elif len(data) and isinstance(data[0], str):
+        shots = [int(m, 16) if m.startswith("0x") else int(m.replace(" ", ""), 2) for m in data]
+    else:
+        shots = [int(x) for x in data]
+
+    tally = {}
+    for state in shots:
+        tally[state] = tally.get(state, 0) + 1
+    return sorted(tally.items())
+
+
+def process_counts(counts: Any,
+                   distance_matrix: List[List[float]],
+                   invalid_penalty: Optional[float] = None,
+                   encoding: str = "one_hot") -> Dict[str, Any]:
+    """
+    Processa as contagens de medição de um circuito QAOA.
+
+    Equivalente a processar_counts/expected_cost dos notebooks: soluções
+    inválidas entram no valor esperado com uma penalidade fixa. As
+    medições são convertidas uma vez em arrays (counts_to_arrays) e
+    validade, custo, valor esperado, fração válida e melhor rota saem de
+    operações vetorizadas sobre tsp_cost_table (até
+    LOOKUP_TABLE_MAX_CITIES cidades; acima disso, decode_state por estado).
+
+    Args:
+        counts: Contagens/memória em qualquer formato de counts_to_arrays
+        distance_matrix: Matriz de distâncias
+        invalid_penalty: Custo atribuído a bitstrings inválidas
+            (padrão: max(D)·n·10, como nos notebooks)
+        encoding: Codificação das medições (ver ENCODINGS)
+
+    Returns:
+        Dicionário com "expected_cost", "valid_fraction", "best_route" e
+        "best_cost"
+
+    Raises:
+        ValueError: Se as contagens não tiverem nenhum shot
+    """
+    D = np.asarray(distance_matrix, dtype=float)
+    n = len(D)
+    if invalid_penalty is None:
+        invalid_penalty = float(np.max(D)) * n * 10
+
+    if n > LOOKUP_TABLE_MAX_CITIES:
+        return _process_counts_large(counts, D, invalid_penalty, encoding)
+
+    states, shots = counts_to_arrays(counts)
+    valid_states, valid_costs, valid_routes = tsp_cost_table(D, encoding)
+
+    idx = np.minimum(np.searchsorted(valid_states, states), len(valid_states) - 1)
+    valid = valid_states[idx] == states
+    costs = np.where(valid, valid_costs[idx], np.inf)
+
+    total_shots = shots.sum()
+    if total_shots == 0:
+        raise ValueError("Nenhuma medição nas contagens (total de shots = 0)")
+    n_valid = shots[valid].sum()
+    exp_cost = (shots[valid] * costs[valid]).sum() + (total_shots - n_valid) * invalid_penalty
+
+    best = int(np.argmin(costs)) if len(costs) else 0
+    has_valid = bool(valid.any())
+
+    return {
+        "expected_cost": float(exp_cost / total_shots),
+        "valid_fraction": float(n_valid / total_shots),
+        "best_route": tuple(int(c) for c in valid_routes[idx[best]]) if has_valid else None,
+        "best_cost": float(costs[best]) if has_valid else float('inf'),
+    }
+
+
+def _process_counts_large(counts: Any, D: np.ndarray, invalid_penalty: float,
+                          encoding: str = "one_hot") -> Dict[str, Any]:
+    """process_counts para n² > 64 bits, decodificando estado a estado."""
+    n = len(D)
+    items = counts_to_python_ints(counts)
+
+    total_shots = 0
+    exp_cost = 0.0
+    n_valid = 0
+    best_cost = float('inf')
+    best_route = None
+    for state, count in items:
+        total_shots += count
+        route = decode_state(state, n, encoding)
+        if route is None:
+            exp_cost += count * invalid_penalty
+            continue
+        cost = float(calculate_route_cost(route, D))
+        n_valid += count
+        exp_cost += count * cost
+        if cost < best_cost:
+            best_cost = cost
+            best_route = route
+
+    if total_shots == 0:
+        raise ValueError("Nenhuma medição nas contagens (total de shots = 0)")
+
+    return {
+        "expected_cost": exp_cost / total_shots,
+        "valid_fraction": n_valid / total_shots,
+        "best_route": best_route,
+        "best_cost": best_cost,
+    }
+
+
+def tsp_cost_diagonal(distance_matrix: List[List[float]],
+                      invalid_penalty: Optional[float] = None,
+                      encoding: str = "one_hot") -> np.ndarray:
+    """
+    Diagonal do custo usado por process_counts, para os 2^N estados da
+    codificação (N = encoding_num_qubits(n, encoding)).
+
+    Estados válidos (as n! permutações) recebem o custo da rota; os demais
+    recebem a penalidade fixa. É o observável cujo valor esperado exato
+    corresponde, sem ruído de amostragem, ao "expected_cost" medido.
+
+    Returns:
+        Array (2^N,) indexado pelo estado (bit q ↔ qubit q)
+    """
+    D = np.asarray(distance_matrix, dtype=float)
+    n = len(D)
+    if invalid_penalty is None:
+        invalid_penalty = float(np.max(D)) * n * 10
+
+    states, costs, _ = tsp_cost_table(D, encoding)
+
+    diag = np.full(1 << encoding_num_qubits(n, encoding), float(invalid_penalty))
+    diag[states.astype(np.intp)] = costs
+    return diag
+
+
+# ============================================================================
+# 3.3 CIRCUITO QAOA PARAMETRIZADO (CONSTRUÍDO E TRANSPILADO UMA VEZ)
+# ============================================================================
+
+def build_qaoa_template(model: Dict[str, Any], p: int, measure: bool = True) -> "QuantumCircuit":
+    """
+    Constrói o circuito QAOA com parâmetros simbólicos γ[l] e β[l].
+
+    Mesma estrutura de qaoa_circuit/qaoa_layer dos notebooks
+    (H⊗N, RZ para h, CNOT-RZ-CNOT para J, RX(2β) como mixer), mas montada
+    uma única vez: a cada avaliação do otimizador basta associar valores
+    aos parâmetros com bind_qaoa_parameters.
+
+    Args:
+        model: Saída de build_tsp_ising
+        p: Número de camadas
+        measure: Se True, adiciona measure_all()
+
+    Returns:
+        QuantumCircuit parametrizado
+    """
+    if not QISKIT_AVAILABLE:
+        raise ImportError("Qiskit não disponível")
+    if "diagonal" in model:
+        raise ValueError("A codificação binária não tem forma de Ising; use os modos \"exact\"/\"statevector\"")
+
+    N = model["num_qubits"]
+    gammas = ParameterVector("γ", p)
+    betas = ParameterVector("β", p)
+
+    qc = QuantumCircuit(N, name=f"qaoa_tsp_p{p}")
+    qc.h(range(N))
+    for layer in range(p):
+        for q, coef in enumerate(model["h"]):
+            if abs(coef) > 1e-10:
+                qc.rz(2 * coef * gammas[layer], q)
+        for (q_i, q_j), coef in zip(model["J_indices"].tolist(), model["J_coeffs"]):
+            qc.cx(q_i, q_j)
+            qc.rz(2 * coef * gammas[layer], q_j)
+            qc.cx(q_i, q_j)
+        qc.rx(2 * betas[layer], range(N))
+
+    if measure:
+        qc.measure_all()
+    return qc
+
+
+def bind_qaoa_parameters(circuit: "QuantumCircuit", params: np.ndarray) -> "QuantumCircuit":
+    """
+    Associa params = [γ_1..γ_p, β_1..β_p] a um template (transpilado ou não).
+    """
+    p = len(params) // 2
+    values = {}
+    for parameter in circuit.parameters:
+        offset = 0 if parameter.vector.name == "γ" else p
+        values[parameter] = float(params[offset + parameter.index])
+    return circuit.assign_parameters(values)
+
+
+def make_qaoa_objective(model: Dict[str, Any],
+                        distance_matrix: List[List[float]],
+                        p: int,
+                        mode: str = "sampling",
+                        backend: Any = None,
+                        shots: int = 2048,
+                        seed: Optional[int] = None,
+                        mixer: str = "parity",
+                        initial_route: Optional[Tuple[int, ...]] = None):
+    """
+    Cria a função objetivo do QAOA para scipy.optimize.minimize.
+
+    Modos:
+        "sampling": o template é construído e transpilado uma única vez para
+            o backend; a cada avaliação apenas os valores de γ/β são
+            associados antes de executar. Retorna o "expected_cost" de
+            process_counts.
+        "statevector": simulador NumPy (qaoa_statevector) com a diagonal de
+            H_C pré-calculada; retorna ⟨H_C⟩ exato, sem shots.
+        "exact": simulador NumPy; retorna o valor esperado exato do mesmo
+            custo estimado em "sampling" (tsp_cost_diagonal), sem ruído de
+            shots — o otimizador converge com menos avaliações.
+        "subspace": mixer XY em vez do mixer X, simulado só nas n! rotas
+            indexadas pelo posto de Lehmer (make_subspace_objective); o
+            mixer X sai do subespaço viável e não admite essa redução.
+            Viabiliza 6 a SUBSPACE_MAX_CITIES cidades (36 a 64 qubits).
+
+    Args:
+        model: Saída de build_tsp_ising (não usado em "subspace", pode ser None)
+        distance_matrix: Matriz de distâncias
+        p: Número de camadas
+        mode: "sampling", "statevector", "exact" ou "subspace"
+        backend: Backend com .run() (padrão: AerSimulator()); só em "sampling"
+        shots: Shots por avaliação; só em "sampling"
+        seed: Seed do simulador (apenas Aer)
+        mixer: "parity" ou "ring"; só em "subspace"
+        initial_route: Rota inicial (make_subspace_objective); só em "subspace"
+
+    Returns:
+        Função objective(params) -> float; em "sampling" ela também expõe
+        os atributos .circuit (template transpilado) e .backend, em
+        "subspace" .statevector e .n
+    """
+    if mode == "subspace":
+        return make_subspace_objective(distance_matrix, p, mixer, initial_route)
+    encoding = model.get("encoding", "one_hot")
+    if mode in ("statevector", "exact"):
+        # A evolução usa sempre H_C; muda apenas o observável medido
+        phase_diagonal = ising_cost_diagonal(model)
+        if mode == "statevector":
+            return lambda params: qaoa_expectation(np.asarray(params), phase_diagonal)
+        cost_diagonal = tsp_cost_diagonal(distance_matrix, encoding=encoding)
+
+        def exact_objective(params: np.ndarray) -> float:
+            p_layers = len(params) // 2
+            psi = qaoa_statevector(phase_diagonal, params[:p_layers], params[p_layers:])
+            return float(np.dot(np.abs(psi) ** 2, cost_diagonal))
+
+        return exact_objective
+    if mode != "sampling":
+        raise ValueError(f"Modo de objetivo desconhecido: {mode}")
+
+    if backend is None:
+        if not AER_AVAILABLE:
+            raise ImportError("qiskit-aer não disponível")
+        backend = AerSimulator()
+
+    transpiled = transpile(build_qaoa_template(model, p), backend)
+    run_options = {"shots": shots}
+    if seed is not None:
+        run_options["seed_simulator"] = seed
+
+    def objective(params: np.ndarray) -> float:
+        bound = bind_qaoa_parameters(transpiled, params)
+        counts = backend.run(bound, **run_options).result().get_counts()
+        return process_counts(counts, distance_matrix, encoding=encoding)["expected_cost"]
+
+    # Expostos para a leitura final reaproveitar o circuito já transpilado
+    objective.circuit = transpiled
+    objective.backend = backend
+    return objective
+
+
+# ============================================================================
+# 3.4 SIMULADOR DE STATEVECTOR NUMPY (HAMILTONIANO DIAGONAL)
+# ============================================================================
+
+def ising_cost_diagonal(model: Dict[str, Any]) -> np.ndarray:
+    """
+    Diagonal de H_C na base computacional: E(z) para os 2^N estados.
+
+    O índice do estado segue a convenção do Qiskit (bit q ↔ qubit q) e
+    z_q = 1 - 2·bit_q. Cada termo é somado in-place sobre uma visão
+    remodelada do vetor, sem materializar os bits de todos os estados.
+
+    Args:
+        model: Saída de build_tsp_ising / build_tsp_model
+
+    Returns:
+        Array (2^N,) com a energia de cada estado (incluindo o offset)
+    """
+    if "diagonal" in model:
+        return model["diagonal"].copy()
+    N = model["num_qubits"]
+    diag = np.full(1 << N, model["offset"])
+    z = np.array([1.0, -1.0])
+
+    for q, coef in enumerate(model["h"]):
+        if abs(coef) > 1e-10:
+            diag.reshape(1 << (N - q - 1), 2, 1 << q)[...] += coef * z[:, None]
+
+    zz = np.outer(z, z)
+    for (a, b), coef in zip(model["J_indices"].tolist(), model["J_coeffs"]):
+        view = diag.reshape(1 << (N - b - 1), 2, 1 << (b - a - 1), 2, 1 << a)
+        view += coef * zz[:, None, :, None]
+
+    return diag
+
+
+def _apply_rx_mixer(psi: np.ndarray, beta: float, num_qubits: int):
+    """Aplica RX(2β) = exp(-iβX) em todos os qubits (in-place)."""
+    c, s = np.cos(beta), -1j * np.sin(beta)
+    for q in range(num_qubits):
+        view = psi.reshape(1 << (num_qubits - q - 1), 2, 1 << q)
+        a0 = view[:, 0, :].copy()
+        view[:, 0, :] *= c
+        view[:, 0, :] += s * view[:, 1, :]
+        view[:, 1, :] *= c
+        view[:, 1, :] += s * a0
+
+
+def qaoa_statevector(cost_diagonal: np.ndarray,
+                     gammas: np.ndarray,
+                     betas: np.ndarray) -> np.ndarray:
+    """
+    Evolui |+⟩^⊗N pelas camadas do QAOA sem construir circuito.
+
+    Como H_C é diagonal, U_C(γ) = exp(-iγH_C) é uma multiplicação
+    elemento a elemento pela fase; o mixer exp(-iβΣX) é aplicado qubit a
+    qubit de forma vetorizada. Equivale (a menos de fase global) ao
+    circuito de qaoa_circuit/build_qaoa_template.
+
+    Returns:
+        Statevector (2^N,) complexo, convenção de bits do Qiskit
+    """
+    dim = len(cost_diagonal)
+    num_qubits = dim.bit_length() - 1
+    psi = np.full(dim, 1 / np.sqrt(dim), dtype=complex)
+    for gamma, beta in zip(gammas, betas):
+        psi *= np.exp(-1j * gamma * cost_diagonal)
+        _apply_rx_mixer(psi, beta, num_qubits)
+    return psi
+
+
+def qaoa_expectation(params: np.ndarray, cost_diagonal: np.ndarray) -> float:
+    """
+    Valor esperado exato ⟨ψ(γ,β)|C|ψ(γ,β)⟩ para params = [γ..., β...].
+
+    `cost_diagonal` é a diagonal do observável (ex.: ising_cost_diagonal).
+    """
+    p = len(params) // 2
+    psi = qaoa_statevector(cost_diagonal, params[:p], params[p:])
+    return float(np.dot(np.abs(psi) ** 2, cost_diagonal))
+
+
+def sample_statevector_counts(psi: np.ndarray, shots: int, seed: Optional[int] = None) -> Dict[str, int]:
+    """
+    Amostra `shots` medições de um statevector, no formato de get_counts()
+    do Qiskit (bitstring com o qubit 0 à direita).
+    """
+    probs = np.abs(psi) ** 2
+    probs /= probs.sum()
+    num_qubits = len(psi).bit_length() - 1
+    hits = np.random.default_rng(seed).multinomial(shots, probs)
+    return {format(int(state), f"0{num_qubits}b"): int(hits[state]) for state in np.flatnonzero(hits)}
+
+
+class _OptimizationCancelled(Exception):
+    """Interrompe o COBYLA de optimize_qaoa quando o cancel_event é sinalizado."""
+
+
+def optimize_qaoa(model: Optional[Dict[str, Any]],
+                  distance_matrix: List[List[float]],
+                  p: int = 1,
+                  mode: str = "exact",
+                  maxiter: int = 200,
+                  initial_params: Optional[np.ndarray] = None,
+                  shots: int = 4096,
+                  seed: Optional[int] = None,
+                  backend: Any = None,
+                  parameter_store: Optional[Dict[str, Any]] = None,
+                  mixer: str = "parity",
+                  cancel_event: Any = None,
+                  initial_route: Optional[Tuple[int, ...]] = None) -> Dict[str, Any]:
+    """
+    Otimiza γ/β com COBYLA e faz a leitura final por amostragem.
+
+    Durante a otimização o objetivo é avaliado no `mode` escolhido (ver
+    make_qaoa_objective); a amostragem com `shots` é usada apenas uma vez,
+    na leitura final dos parâmetros ótimos. Com `parameter_store`, o chute
+    inicial vem da solução armazenada mais próxima (warm_start_parameters)
+    e o resultado é registrado no store ao final. Se `cancel_event` é
+    sinalizado, o COBYLA para na avaliação seguinte e a leitura usa o
+    melhor ponto visto até então (nada é registrado no store).
+
+    Args:
+        model: Saída de build_tsp_ising; None em "subspace", que não usa
+            Hamiltoniano de qubits (o store é chaveado por n, p e mixer)
+        distance_matrix: Matriz de distâncias
+        p: Número de camadas
+        mode: "exact" (padrão), "statevector", "sampling" ou "subspace"
+        maxiter: Iterações máximas do COBYLA
+        initial_params: Chute inicial [γ..., β...] (padrão: 0.5 em tudo)
+        shots: Shots da leitura final
+        seed: Seed da amostragem
+        backend: Backend do modo "sampling"
+        parameter_store: Store de load_parameter_store (opcional)
+        mixer: Mixer XY do modo "subspace" ("parity" ou "ring")
+        cancel_event: Event (threading/multiprocessing) de interrupção
+        initial_route: Rota inicial do modo "subspace" (make_subspace_objective)
+
+    Returns:
+        Dicionário com "params", "gammas", "betas", "objective", "nfev",
+        "warm_start", "cancelled", "counts" e "readout" (saída de
+        process_counts)
+    """
+    if not SCIPY_AVAILABLE:
+        raise ImportError("SciPy não disponível para otimizar o QAOA")
+
+    objective = make_qaoa_objective(model, distance_matrix, p, mode=mode, backend=backend,
+                                    seed=seed, mixer=mixer, initial_route=initial_route)
+    store_mixer = mixer if mode == "subspace" else None
+    warm_start = False
+    if initial_params is None and parameter_store is not None:
+        initial_params = warm_start_parameters(parameter_store, model, distance_matrix, p,
+                                               mode=mode, mixer=store_mixer)
+        warm_start = initial_params is not None
+    x0 = np.full(2 * p, 0.5) if initial_params is None else np.asarray(initial_params, dtype=float)
+
+    best = {"x": x0, "fun": float('inf'), "nfev": 0}
+
+    def tracked_objective(x: np.ndarray) -> float:
+        if cancel_event is not None and cancel_event.is_set():
+            raise _OptimizationCancelled
+        value = objective(x)
+        best["nfev"] += 1
+        if value < best["fun"]:
+            best.update(x=np.array(x, dtype=float), fun=float(value))
+        return value
+
+    cancelled = False
+    try:
+        result = minimize(tracked_objective, x0, method="COBYLA", options={"maxiter": maxiter})
+        params, fun, nfev = result.x, float(result.fun), int(result.nfev)
+    except _OptimizationCancelled:
+        cancelled = True
+        params, fun, nfev = best["x"], best["fun"], best["nfev"]
+
+    if parameter_store is not None and not cancelled:
+        record_qaoa_parameters(parameter_store, model, distance_matrix, params, fun,
+                               mode=mode, mixer=store_mixer)
+
+    if mode == "sampling":
+        bound = bind_qaoa_parameters(objective.circuit, params)
+        run_options = {"shots": shots} if seed is None else {"shots": shots, "seed_simulator": seed}
+        counts = objective.backend.run(bound, **run_options).result().get_counts()
+    elif mode == "subspace":
+        counts = sample_subspace_counts(objective.statevector(params), objective.n, shots, seed)
+    else:
+        psi = qaoa_statevector(ising_cost_diagonal(model), params[:p], params[p:])
+        counts = sample_statevector_counts(psi, shots, seed)
+    encoding = "one_hot" if mode == "subspace" else model.get("encoding", "one_hot")
+
+    return {
+        "params": params,
+        "gammas": params[:p],
+        "betas": params[p:],
+        "objective": fun,
+        "nfev": nfev,
+        "warm_start": warm_start,
+        "cancelled": cancelled,
+        "counts": counts,
+        "readout": process_counts(counts, distance_matrix, encoding=encoding),
+    }
+
+
+def solve_tsp_qaoa_statevector(distance_matrix: List[List[float]],
+                               p: int = 1,
+                               maxiter: int = 100,
+                               seed: int = 42,
+                               shots: int = 4096,
+                               mode: str = "exact",
+                               max_qubits: int = 20,
+                               parameter_store_path: Optional[str] = None,
+                               encoding: str = "one_hot",
+                               penalty: Any = None) -> Dict[str, Any]:
+    """
+    Resolve TSP com o QAOA dos notebooks no simulador NumPy.
+
+    Mesmo formato de retorno de solve_tsp_qaoa, para uso em main() e
+    analyze_results.
+
+    Args:
+        distance_matrix: Matriz de distâncias
+        p: Número de camadas do QAOA
+        maxiter: Iterações máximas do COBYLA
+        seed: Seed da leitura final
+        shots: Shots da leitura final
+        mode: Modo do objetivo durante a otimização ("exact", "statevector"
+            ou "subspace"; este delega a solve_tsp_qaoa_xy com o mixer
+            "parity" e é limitado por SUBSPACE_MAX_CITIES em vez de
+            max_qubits)
+        max_qubits: Limite de qubits para evitar statevectors inviáveis
+        parameter_store_path: Arquivo JSON do store de parâmetros; se
+            informado, a otimização parte da solução armazenada mais próxima
+            e o resultado é salvo de volta
+        encoding: Codificação do registrador (ver ENCODINGS); "fixed_start"
+            e "binary" cabem em max_qubits=20 até 5 e 6 cidades
+        penalty: Fator A: None (padrão de build_tsp_model), um número,
+            "bound" ou "pilot" (tune_penalty); o valor usado volta em
+            "penalty" e a origem em "penalty_method". Ignorado em
+            "subspace", que não usa penalidade nem registrador de qubits
+            (o resultado não traz "penalty" nem "num_qubits")
+
+    Returns:
+        Dicionário com resultados e tempos
+    """
+    if mode == "subspace":
+        return solve_tsp_qaoa_xy(distance_matrix, p=p, maxiter=maxiter, seed=seed, shots=shots,
+                                 parameter_store_path=parameter_store_path)
+
+    start_time = time.time()
+    n_cities = len(distance_matrix)
+
+    num_qubits = encoding_num_qubits(n_cities, encoding)
+    if num_qubits > max_qubits:
+        return {
+            "success": False,
+            "error": f"{num_qubits} qubits excede o limite de {max_qubits} do simulador",
+            "time": time.time() - start_time,
+        }
+
+    try:
+        A, penalty_method = _resolve_penalty(distance_matrix, penalty, encoding,
+                                             p=p, mode="statevector" if mode == "statevector" else "exact",
+                                             max_qubits=max_qubits)
+        model = build_tsp_model(distance_matrix, encoding, penalty=A)
+        store = load_parameter_store(parameter_store_path) if parameter_store_path else None
+        result = optimize_qaoa(model, distance_matrix, p=p, mode=mode,
+                               maxiter=maxiter, shots=shots, seed=seed,
+                               parameter_store=store)
+        if store is not None:
+            save_parameter_store(store, parameter_store_path)
+        readout = result["readout"]
+        route = readout["best_route"]
+
+        return {
+            "success": True,
+            "route": route,
+            "cost": float(readout["best_cost"]) if route else float('inf'),
+            "time": time.time() - start_time,
+            "iterations": result["nfev"],
+            "fval": result["objective"],
+            "warm_start": result["warm_start"],
+            "valid_fraction": readout["valid_fraction"],
+            "params": result["params"].tolist(),
+            "encoding": encoding,
+            "num_qubits": num_qubits,
+            "penalty": model["penalty"],
+            "penalty_method": penalty_method,
+        }
+
+    except Exception as e:
+        elapsed_time = time.time() - start_time
+        print(f"❌ Erro QAOA statevector ({n_cities} cidades): {type(e).__name__}: {str(e)[:100]}")
+        return {
+            "success": False,
+            "error": str(e),
+            "time": elapsed_time
+        }
+
+
+# ============================================================================
+# 3.5 WARM-START E TRANSFERÊNCIA DE PARÂMETROS γ/β
+# ============================================================================
+
+def instance_features(distance_matrix: List[List[float]]) -> np.ndarray:
+    """
+    Estatísticas normalizadas da matriz usadas para comparar instâncias.
+
+    Distâncias fora da diagonal divididas pelo máximo: média, desvio
+    padrão, mínimo e assimetria média |d_ij - d_ji|.
+    """
+    D = np.asarray(distance_matrix, dtype=float)
+    n = len(D)
+    off = ~np.eye(n, dtype=bool)
+    scale = float(np.max(D)) or 1.0
+    values = D[off] / scale
+    asymmetry = np.abs(D - D.T)[off].mean() / scale if n > 1 else 0.0
+    return np.array([values.mean(), values.std(), values.min(), asymmetry]) if n > 1 else np.zeros(4)
+
+
+def _energy_scale(model: Optional[Dict[str, Any]], mode: str = "exact") -> float:
+    """
+    Escala da fase usada para normalizar γ entre instâncias.
+
+    Em "subspace" a fase já é custo / max(custo de rota) (ver
+    make_subspace_objective), então γ está normalizado pelo custo máximo
+    de rota e a escala é 1; nos demais modos é a escala de H_C.
+    """
+    if mode == "subspace":
+        return 1.0
+    if "diagonal" in model:
+        return model["penalty"] / 2
+    return float(np.max(np.abs(model["J_coeffs"]))) if len(model["J_coeffs"]) else 1.0
+
+
+def interpolate_qaoa_parameters(params: np.ndarray) -> np.ndarray:
+    """
+    Estende um schedule de p para p+1 camadas (heurística INTERP).
+
+    Para i = 1..p+1: x'_i = (i-1)/p · x_{i-1} + (p-i+1)/p · x_i, com
+    x_0 = x_{p+1} = 0, aplicado separadamente a γ e a β.
+    """
+    params = np.asarray(params, dtype=float)
+    p = len(params) // 2
+
+    def grow(x: np.ndarray) -> np.ndarray:
+        padded = np.concatenate([[0.0], x, [0.0]])
+        i = np.arange(1, p + 2)
+        return (i - 1) / p * padded[i - 1] + (p - i + 1) / p * padded[i]
+
+    return np.concatenate([grow(params[:p]), grow(params[p:])])
+
+
+def load_parameter_store(path: str) -> Dict[str, Any]:
+    """Carrega o store de parâmetros (JSON); vazio se o arquivo não existe."""
+    if not os.path.exists(path):
+        return {"entries": []}
+    with open(path) as f:
+        return json.load(f)
+
+
+@contextmanager
+def _store_lock(path: str):
+    """Lock exclusivo em `path`.lock (fcntl); sem fcntl, não bloqueia."""
+    if not FCNTL_AVAILABLE:
+        yield
+        return
+    with open(f"{path}.lock", 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def save_parameter_store(store: Dict[str, Any], path: str):
+    """
+    Grava o store de forma atômica, mesclando com o conteúdo em disco.
+
+    Sob um lock de arquivo, as entradas gravadas por outros processos
+    (workers de multistart ou de run_tsp_batch com o mesmo store) são
+    relidas e mescladas por chave, mantendo o melhor objetivo; o resultado
+    vai para um arquivo temporário exclusivo (tempfile.mkstemp) e entra no
+    lugar com os.replace. `store` passa a conter a versão mesclada.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    with _store_lock(path):
+        merged = load_parameter_store(path)
+        for entry in store["entries"]:
+            _merge_store_entry(merged, entry)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(merged, f, indent=2)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    store["entries"] = merged["entries"]
+
+
+def _merge_store_entry(store: Dict[str, Any], entry: Dict[str, Any]):
+    """Insere `entry`, substituindo a de mesma chave só se o objetivo for melhor."""
+    for k, old in enumerate(store["entries"]):
+        if (old["n"] == entry["n"] and old["p"] == entry["p"] and old["features"] == entry["features"]
+                and old.get("encoding", "one_hot") == entry.get("encoding", "one_hot")
+                and old.get("mode", "exact") == entry.get("mode", "exact")
+                and old.get("mixer") == entry.get("mixer")):
+            if entry["objective"] < old["objective"]:
+                store["entries"][k] = entry
+            return
+    store["entries"].append(entry)
+
+
+def record_qaoa_parameters(store: Dict[str, Any],
+                           model: Optional[Dict[str, Any]],
+                           distance_matrix: List[List[float]],
+                           params: np.ndarray,
+                           objective: float,
+                           mode: str = "exact",
+                           mixer: Optional[str] = None):
+    """
+    Registra γ/β otimizados no store, chaveados por (n, p, codificação,
+    modo do objetivo, mixer XY, estatísticas normalizadas da matriz).
+
+    A chave sai só da matriz e dos argumentos; `model` é usado apenas para
+    a codificação e a escala de H_C, e pode ser None em "subspace"
+    (one-hot, escala 1).
+
+    γ é armazenado multiplicado pela escala de H_C, para ser transferível
+    entre instâncias de escalas diferentes. Se já existe uma entrada com a
+    mesma chave, ela só é substituída quando o novo objetivo é melhor; o
+    modo faz parte da chave porque cada modo mede um observável diferente.
+    Entradas antigas sem "mode" contam como "exact".
+    """
+    params = np.asarray(params, dtype=float)
+    p = len(params) // 2
+    features = np.round(instance_features(distance_matrix), 6).tolist()
+    encoding = model.get("encoding", "one_hot") if model is not None else "one_hot"
+    entry = {
+        "n": len(distance_matrix),
+        "p": p,
+        "encoding": encoding,
+        "mode": mode,
+        "features": features,
+        "gammas": (params[:p] * _energy_scale(model, mode)).tolist(),
+        "betas": params[p:].tolist(),
+        "objective": objective,
+    }
+    if mixer is not None:
+        entry["mixer"] = mixer
+    _merge_store_entry(store, entry)
+
+
+def warm_start_parameters(store: Dict[str, Any],
+                          model: Optional[Dict[str, Any]],
+                          distance_matrix: List[List[float]],
+                          p: int,
+                          size_weight: float = 0.25,
+                          mode: str = "exact",
+                          mixer: Optional[str] = None) -> Optional[np.ndarray]:
+    """
+    Chute inicial para p camadas a partir da solução armazenada mais próxima.
+
+    A proximidade é a distância euclidiana entre as estatísticas
+    normalizadas mais `size_weight`·|n - n'|, o que permite transferir
+    parâmetros entre tamanhos de instância. Entradas com p' < p são
+    estendidas por interpolate_qaoa_parameters; entradas com p' > p são
+    ignoradas, assim como as de outra codificação, de outro `mode` do
+    objetivo ou de outro `mixer`. Entre distâncias iguais, prefere-se o
+    maior p'. `model` pode ser None em "subspace".
+
+    Returns:
+        Array [γ..., β...] ou None se não há entrada utilizável
+    """
+    features = instance_features(distance_matrix)
+    n = len(distance_matrix)
+    encoding = model.get("encoding", "one_hot") if model is not None else "one_hot"
+    candidates = [e for e in store["entries"]
+                  if e["p"] <= p and e.get("encoding", "one_hot") == encoding
+                  and e.get("mode", "exact") == mode and e.get("mixer") == mixer]
+    if not candidates:
+        return None
+
+    def distance(entry: Dict[str, Any]) -> Tuple[float, int]:
+        gap = np.linalg.norm(features - np.asarray(entry["features"])) + size_weight * abs(entry["n"] - n)
+        return gap, -entry["p"]
+
+    best = min(candidates, key=distance)
+    params = np.concatenate([np.asarray(best["gammas"]) / _energy_scale(model, mode), best["betas"]])
+    while len(params) // 2 < p:
+        params = interpolate_qaoa_parameters(params)
+    return params
+
+
+def optimize_qaoa_layerwise(model: Optional[Dict[str, Any]],
+                            distance_matrix: List[List[float]],
+                            p_max: int,
+                            parameter_store: Optional[Dict[str, Any]] = None,
+                            **kwargs) -> List[Dict[str, Any]]:
+    """
+    Otimiza p = 1..p_max, iniciando cada profundidade pela interpolação
+    (INTERP) do ótimo da anterior.
+
+    Args:
+        model: Saída de build_tsp_ising (None em "subspace")
+        distance_matrix: Matriz de distâncias
+        p_max: Profundidade final
+        parameter_store: Store usado no warm-start de p=1 e para registrar
+            todas as profundidades
+        **kwargs: Repassados a optimize_qaoa
+
+    Returns:
+        Lista com o resultado de optimize_qaoa para cada p
+    """
+    results = []
+    initial_params = None
+    for p in range(1, p_max + 1):
+        result = optimize_qaoa(model, distance_matrix, p=p, initial_params=initial_params,
+                               parameter_store=parameter_store, **kwargs)
+        results.append(result)
+        initial_params = interpolate_qaoa_parameters(result["params"])
+    return results
+
+
+# ============================================================================
+# 3.6 MULTI-START PARALELO DO QAOA
+# ============================================================================
+
+def _multistart_task(model: Optional[Dict[str, Any]],
+                     distance_matrix: List[List[float]],
+                     p: int,
+                     initial_params: np.ndarray,
+                     options: Dict[str, Any]) -> Dict[str, Any]:
+    """Uma trajetória COBYLA; em "sampling" cria seu próprio AerSimulator."""
+    return optimize_qaoa(model, distance_matrix, p=p, initial_params=initial_params, **options)
+
+
+def optimize_qaoa_multistart(model: Optional[Dict[str, Any]],
+                             distance_matrix: List[List[float]],
+                             p: int = 1,
+                             n_starts: int = 8,
+                             max_workers: Optional[int] = None,
+                             target_ratio: Optional[float] = None,
+                             optimal_cost: Optional[float] = None,
+                             seed: Optional[int] = None,
+                             **kwargs) -> Dict[str, Any]:
+    """
+    Executa K trajetórias independentes de optimize_qaoa em paralelo.
+
+    Cada início sorteia γ ∈ [0, π/escala) (_energy_scale do `mode`) e
+    β ∈ [0, π) e roda em um processo do pool, com seu próprio simulador.
+    Os resultados são consumidos à medida que terminam; se um deles atinge
+    `target_ratio` (custo ótimo / melhor custo lido), os inícios ainda não
+    iniciados são cancelados e os que estão rodando são interrompidos por
+    um Event compartilhado (multiprocessing.Manager), que optimize_qaoa
+    verifica a cada avaliação. Os resultados de todas as trajetórias que
+    chegaram a terminar, inteiras ou interrompidas, entram na escolha do
+    melhor.
+
+    Args:
+        model: Saída de build_tsp_ising (None em "subspace")
+        distance_matrix: Matriz de distâncias
+        p: Número de camadas
+        n_starts: Número de inícios K
+        max_workers: Processos (padrão: min(K, os.cpu_count()))
+        target_ratio: Razão de aproximação para parada antecipada (ex.: 1.0)
+        optimal_cost: Custo ótimo de referência (padrão: Held-Karp, se
+            target_ratio for usado)
+        seed: Seed dos pontos iniciais e das leituras
+        **kwargs: Repassados a optimize_qaoa (mode, maxiter, shots, ...)
+
+    Returns:
+        Melhor resultado de optimize_qaoa (menor custo lido, depois menor
+        objetivo), acrescido de "approximation_ratio", "starts_completed"
+        (trajetórias que convergiram sem interrupção), "starts_interrupted"
+        e "stopped_early"
+    """
+    rng = np.random.default_rng(seed)
+    scale = _energy_scale(model, kwargs.get("mode", "exact"))
+    starts = [np.concatenate([rng.uniform(0, np.pi / scale, p), rng.uniform(0, np.pi, p)])
+              for _ in range(n_starts)]
+    if target_ratio is not None and optimal_cost is None:
+        optimal_cost = solve_tsp_held_karp(distance_matrix)[0]
+    workers = min(n_starts, max_workers or os.cpu_count() or 1)
+
+    def ratio(result: Dict[str, Any]) -> float:
+        best_cost = result["readout"]["best_cost"]
+        if optimal_cost is None or not np.isfinite(best_cost) or best_cost <= 0:
+            return float('nan')
+        return optimal_cost / best_cost
+
+    def start_options(k: int) -> Dict[str, Any]:
+        return dict(kwargs, seed=None if seed is None else seed + k)
+
+    completed = []
+    stopped_early = False
+
+    if workers == 1:
+        for k, x0 in enumerate(starts):
+            completed.append(_multistart_task(model, distance_matrix, p, x0, start_options(k)))
+            if target_ratio is not None and ratio(completed[-1]) >= target_ratio:
+                stopped_early = k + 1 < n_starts
+                break
+    else:
+        manager = multiprocessing.Manager() if target_ratio is not None else None
+        cancel_event = manager.Event() if manager is not None else None
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            futures = [executor.submit(_multistart_task, model, distance_matrix, p, x0,
+                                       dict(start_options(k), cancel_event=cancel_event))
+                       for k, x0 in enumerate(starts)]
+            consumed = set()
+            for future in as_completed(futures):
+                consumed.add(future)
+                completed.append(future.result())
+                if target_ratio is not None and ratio(completed[-1]) >= target_ratio:
+                    stopped_early = len(completed) < n_starts
+                    cancel_event.set()
+                    break
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            if manager is not None:
+                manager.shutdown()
+
+        # Trajetórias que terminaram (ou foram interrompidas) depois do alvo
+        for future in futures:
+            if future not in consumed and future.done() and not future.cancelled() and future.exception() is None:
+                completed.append(future.result())
+
+    best = min(completed, key=lambda r: (r["readout"]["best_cost"], r["objective"]))
+    interrupted = sum(1 for r in completed if r.get("cancelled"))
+    return dict(best,
+                approximation_ratio=ratio(best),
+                starts_completed=len(completed) - interrupted,
+                starts_interrupted=interrupted,
+                stopped_early=stopped_early)
+
+
+# ============================================================================
+# 3.7 SIMULATED ANNEALING VETORIZADO (ALTERNATIVA LOCAL AO NEAL / D-WAVE)
+# ============================================================================
+
+def qubo_to_ising(Q: np.ndarray, offset: float = 0.0) -> Dict[str, Any]:
+    """
+    Converte uma matriz QUBO (E(x) = xᵀ Q x + offset, x ∈ {0,1}) para o
+    formato de Ising de build_tsp_ising, com x = (1 - z)/2.
+
+    Aceita Q triangular superior (como no notebook adiabático) ou cheia;
+    os termos Q_ij e Q_ji são somados.
+
+    Returns:
+        Dicionário com "h", "J_indices", "J_coeffs", "offset" e "num_qubits"
+    """
+    Q = np.asarray(Q, dtype=float)
+    N = len(Q)
+    diag = np.diag(Q)
+    W = np.triu(Q, 1) + np.tril(Q, -1).T
+    a, b = np.nonzero(np.abs(W) > 1e-12)
+    w = W[a, b]
+
+    # Q_ii x_i = Q_ii (1 - z_i)/2 ; W_ab x_a x_b = W_ab (1 - z_a - z_b + z_a z_b)/4
+    h = -diag / 2 - np.bincount(a, weights=w, minlength=N) / 4 - np.bincount(b, weights=w, minlength=N) / 4
+    return {
+        "h": h,
+        "J_indices": np.stack([a, b], axis=1),
+        "J_coeffs": w / 4,
+        "offset": float(offset + diag.sum() / 2 + w.sum() / 4),
+        "num_qubits": N,
+    }
+
+
+def _default_beta_range(h: np.ndarray, J: np.ndarray) -> Tuple[float, float]:
+    """
+    Faixa de β como no neal: no início o maior ΔE possível ainda é aceito
+    com probabilidade 1/2; no fim o menor ΔE é aceito com probabilidade 1/100.
+    """
+    field = np.abs(h) + np.abs(J).sum(axis=1)
+    max_delta = 2 * float(field.max()) or 1.0
+    nonzero = np.concatenate([np.abs(h), np.abs(J).ravel()])
+    nonzero = nonzero[nonzero > 1e-12]
+    min_delta = 2 * float(nonzero.min()) if len(nonzero) else 1.0
+    return np.log(2) / max_delta, np.log(100) / min_delta
+
+
+def sample_ising_annealing(model: Dict[str, Any],
+                           num_reads: int = 1000,
+                           num_sweeps: int = 1000,
+                           beta_range: Optional[Tuple[float, float]] = None,
+                           seed: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Simulated annealing (Metropolis, varredura sequencial) sobre um modelo de Ising.
+
+    As `num_reads` réplicas evoluem juntas como um array (reads × N): cada
+    passo decide o flip do spin q em todas as réplicas de uma vez. Os campos
+    locais L = h + z·J são mantidos incrementalmente, então o ΔE = -2·z_q·L_q
+    de cada flip custa O(1) e só a coluna de J do spin trocado é somada.
+    Schedule geométrico de β, como no neal.
+
+    Args:
+        model: Saída de build_tsp_ising ou qubo_to_ising
+        num_reads: Número de amostras independentes
+        num_sweeps: Varreduras completas por amostra
+        beta_range: (β inicial, β final); padrão estimado dos coeficientes
+        seed: Seed do gerador
+
+    Returns:
+        Dicionário com "samples" (reads × N, bits x = (1-z)/2, x_q = qubit q),
+        "energies", "states" (inteiros no padrão do Qiskit; só para N ≤ 64),
+        "counts" (bitstrings Qiskit → ocorrências, aceito por process_counts)
+        e "beta_range"
+    """
+    rng = np.random.default_rng(seed)
+    N = model["num_qubits"]
+    h = np.asarray(model["h"], dtype=float)
+    J = ising_coupling_matrix(model, sparse=False)
+    J = J + J.T
+
+    if beta_range is None:
+        beta_range = _default_beta_range(h, J)
+    betas = np.geomspace(beta_range[0], beta_range[1], num_sweeps)
+
+    z = rng.choice(np.array([-1.0, 1.0]), size=(num_reads, N))
+    fields = h + z @ J
+
+    for beta in betas:
+        thresholds = np.log(rng.random((num_reads, N))) / -beta
+        for q in range(N):
+            delta = -2.0 * z[:, q] * fields[:, q]
+            flip = delta < thresholds[:, q]
+            if flip.any():
+                step = np.where(flip, -2.0 * z[:, q], 0.0)
+                z[:, q] += step
+                fields += step[:, None] * J[q]
+
+    energies = model["offset"] + z @ h + 0.5 * np.einsum('ij,ij->i', z, z @ J)
+    samples = ((1 - z) / 2).astype(np.uint8)
+
+    # bitstring do Qiskit: qubit 0 é o caractere mais à direita
+    keys, occurrences = np.unique(samples[:, ::-1], axis=0, return_counts=True)
+    counts = {"".join(map(str, row)): int(c) for row, c in zip(keys, occurrences)}
+
+    output = {
+        "samples": samples,
+        "energies": energies,
+        "counts": counts,
+        "beta_range": tuple(float(b) for b in beta_range),
+    }
+    if N <= 64:
+        weights = np.uint64(1) << np.arange(N, dtype=np.uint64)
+        output["states"] = (samples.astype(np.uint64) * weights).sum(axis=1, dtype=np.uint64)
+    return output
+
+
+def sample_qubo_annealing(Q: np.ndarray, offset: float = 0.0, **kwargs) -> Dict[str, Any]:
+    """sample_ising_annealing para uma matriz QUBO (ex.: a Q de bqm_4 do notebook)."""
+    return sample_ising_annealing(qubo_to_ising(Q, offset), **kwargs)
+
+
+def solve_tsp_annealing(distance_matrix: List[List[float]],
+                        num_reads: int = 1000,
+                        num_sweeps: int = 1000,
+                        seed: int = 42,
+                        penalty: Any = None,
+                        encoding: str = "one_hot") -> Dict[str, Any]:
+    """
+    Resolve TSP por simulated annealing sobre o Hamiltoniano one-hot.
+
+    Mesmo formato de retorno de solve_tsp_qaoa, para uso em main() e
+    analyze_results.
+
+    Args:
+        distance_matrix: Matriz de distâncias
+        num_reads: Número de amostras
+        num_sweeps: Varreduras por amostra
+        seed: Seed do gerador
+        penalty: Fator A: None (padrão de build_tsp_ising), um número,
+            "bound" ou "pilot" (tune_penalty)
+        encoding: "one_hot" ou "fixed_start" (a binária não é quadrática)
+
+    Returns:
+        Dicionário com resultados e tempos
+    """
+    start_time = time.time()
+    n_cities = len(distance_matrix)
+
+    try:
+        if encoding == "binary":
+            raise ValueError("A codificação binária não tem forma de Ising")
+        A, penalty_method = _resolve_penalty(distance_matrix, penalty, encoding)
+        model = build_tsp_model(distance_matrix, encoding, penalty=A)
+        sampleset = sample_ising_annealing(model, num_reads=num_reads, num_sweeps=num_sweeps, seed=seed)
+        readout = process_counts(sampleset.get("states", sampleset["counts"]), distance_matrix,
+                                 encoding=encoding)
+        route = readout["best_route"]
+
+        return {
+            "success": True,
+            "route": route,
+            "cost": float(readout["best_cost"]) if route else float('inf'),
+            "time": time.time() - start_time,
+            "iterations": num_sweeps,
+            "fval": float(sampleset["energies"].min()),
+            "valid_fraction": readout["valid_fraction"],
+            "penalty": model["penalty"],
+            "penalty_method": penalty_method,
+        }
+
+    except Exception as e:
+        elapsed_time = time.time() - start_time
+        print(f"❌ Erro annealing ({n_cities} cidades): {type(e).__name__}: {str(e)[:100]}")
+        return {
+            "success": False,
+            "error": str(e),
+            "time": elapsed_time
+        }
+
+
+# ============================================================================
+# 3.8 QAOA COM MIXER XY (PRESERVA AS RESTRIÇÕES, SUBESPAÇO VIÁVEL)
+# ============================================================================
+
+XY_MIXERS = ("parity", "ring")
+
+# Maior n simulado no subespaço por padrão (8! = 40320 amplitudes)
+SUBSPACE_MAX_CITIES = 8
+
+
+def permutation_rank(perms: np.ndarray) -> np.ndarray:
+    """
+    Posto lexicográfico (código de Lehmer) de cada linha de `perms`.
+
+    rank = Σ_i L_i·(n-1-i)!, com L_i = #{j > i : p_j < p_i}; vetorizado
+    sobre todas as linhas.
+
+    Args:
+        perms: Array (k, n) de permutações de range(n)
+
+    Returns:
+        Array (k,) int64
+    """
+    perms = np.asarray(perms)
+    n = perms.shape[1]
+    later = np.triu(np.ones((n, n), dtype=bool), 1)
+    lehmer = ((perms[:, :, None] > perms[:, None, :]) & later).sum(axis=2)
+    factorials = np.array([np.prod(np.arange(1, n - i), dtype=np.int64) for i in range(n)], dtype=np.int64)
+    return lehmer @ factorials
+
+
+def permutation_unrank(ranks: np.ndarray, n: int) -> np.ndarray:
+    """
+    Inversa de permutation_rank: postos → permutações (k, n), vetorizado.
+
+    Cada dígito do código de Lehmer escolhe o d-ésimo elemento ainda livre.
+    """
+    ranks = np.asarray(ranks, dtype=np.int64).copy()
+    perms = np.empty((len(ranks), n), dtype=np.int64)
+    free = np.ones((len(ranks), n), dtype=bool)
+    for i in range(n):
+        base = int(np.prod(np.arange(1, n - i), dtype=np.int64))
+        digit = ranks // base
+        ranks -= digit * base
+        chosen = np.argmax(np.cumsum(free, axis=1) > digit[:, None], axis=1)
+        perms[:, i] = chosen
+        free[np.arange(len(perms)), chosen] = False
+    return perms
+
+
+@lru_cache(maxsize=None)
+def permutation_subspace(n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Base do subespaço viável da codificação one-hot: as n! rotas, indexadas
+    pelo posto de Lehmer (a amplitude k é a da rota permutation_unrank(k)).
+
+    O mixer de troca entre tempos vizinhos (swap de x_{u,t}, x_{v,t+1} com
+    x_{v,t}, x_{u,t+1}, soma de termos XX+YY) leva uma rota válida em outra
+    rota válida trocando as cidades dos tempos t e t+1. Dentro do subespaço
+    cada termo P_t é uma permutação involutiva das n! amplitudes. Sem
+    estados inteiros de n² bits, não há limite de 64 qubits.
+
+    Returns:
+        (perms, swaps): perms (n!, n) com perms[k, t] = cidade no tempo t;
+        swaps (n, n!) com swaps[t, k] = posto da rota k com os tempos
+        t e (t+1) mod n trocados
+    """
+    perms = permutation_unrank(np.arange(np.prod(np.arange(1, n + 1), dtype=np.int64)), n)
+    swaps = np.empty((n, len(perms)), dtype=np.intp)
+    for t in range(n):
+        u = (t + 1) % n
+        swapped = perms.copy()
+        swapped[:, [t, u]] = perms[:, [u, t]]
+        swaps[t] = permutation_rank(swapped)
+    return perms, swaps
+
+
+def subspace_tour_costs(distance_matrix: List[List[float]]) -> np.ndarray:
+    """Custo das n! rotas na ordem de permutation_subspace (calculate_route_costs)."""
+    D = np.asarray(distance_matrix, dtype=float)
+    perms, _ = permutation_subspace(len(D))
+    return calculate_route_costs(np.column_stack([perms, perms[:, 0]]), D)
+
+
+def _parity_groups(n: int) -> List[List[int]]:
+    """Partição dos n pares (t, t+1 mod n) em grupos de pares disjuntos."""
+    even = [t for t in range(0, n - 1, 2)]
+    odd = [t for t in range(1, n, 2)]
+    groups = [even, odd]
+    if n % 2 == 1 and n > 2:
+        groups.append([n - 1])
+    return [g for g in groups if g]
+
+
+@lru_cache(maxsize=8)
+def _ring_mixer_hamiltonian(n: int):
+    """H_M = Σ_t P_t (anel de trocas) como matriz esparsa n! × n!."""
+    if not SCIPY_AVAILABLE:
+        raise ImportError("SciPy não disponível para o mixer em anel")
+    _, swaps = permutation_subspace(n)
+    dim = swaps.shape[1]
+    rows = np.tile(np.arange(dim), n)
+    return scipy.sparse.csr_matrix((np.ones(n * dim), (rows, swaps.ravel())), shape=(dim, dim))
+
+
+def _apply_xy_mixer(psi: np.ndarray, beta: float, n: int, mixer: str) -> np.ndarray:
+    """
+    Aplica o mixer XY no subespaço viável.
+
+    "parity": produto ordenado de exp(-iβP_t) por grupo de pares disjuntos
+        (P_t² = I ⇒ exp(-iβP_t) = cos β - i sin β P_t), como num circuito.
+    "ring": exp(-iβ Σ_t P_t) exato, via expm_multiply esparso.
+    """
+    if mixer == "ring":
+        return expm_multiply(-1j * beta * _ring_mixer_hamiltonian(n), psi)
+    if mixer != "parity":
+        raise ValueError(f"Mixer desconhecido: {mixer} (use um de {XY_MIXERS})")
+    _, swaps = permutation_subspace(n)
+    c, s = np.cos(beta), -1j * np.sin(beta)
+    for group in _parity_groups(n):
+        for t in group:
+            psi = c * psi + s * psi[swaps[t]]
+    return psi
+
+
+def qaoa_xy_statevector(phase_costs: np.ndarray,
+                        gammas: np.ndarray,
+                        betas: np.ndarray,
+                        n: int,
+                        mixer: str = "parity",
+                        initial_state: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Evolui o QAOA com mixer XY apenas sobre as n! amplitudes viáveis.
+
+    Args:
+        phase_costs: Custo de cada rota na ordem de permutation_subspace
+        gammas, betas: Parâmetros das p camadas
+        n: Número de cidades
+        mixer: "parity" ou "ring"
+        initial_state: Amplitudes iniciais (padrão: superposição uniforme
+            de todas as rotas)
+
+    Returns:
+        Vetor (n!,) complexo
+    """
+    dim = len(phase_costs)
+    if initial_state is None:
+        psi = np.full(dim, 1 / np.sqrt(dim), dtype=complex)
+    else:
+        psi = np.asarray(initial_state, dtype=complex).copy()
+    for gamma, beta in zip(gammas, betas):
+        psi = psi * np.exp(-1j * gamma * phase_costs)
+        psi = _apply_xy_mixer(psi, beta, n, mixer)
+    return psi
+
+
+def make_subspace_objective(distance_matrix: List[List[float]],
+                            p: int,
+                            mixer: str = "parity",
+                            initial_route: Optional[Tuple[int, ...]] = None):
+    """
+    Objetivo exato do QAOA com mixer XY, avaliado no subespaço das n! rotas.
+
+    Os custos das rotas são calculados uma vez (subspace_tour_costs). Não há
+    penalidade: toda amplitude fica em rotas válidas e o objetivo é o custo
+    médio exato. Na fase usa-se custo / max(custo), para que γ fique na
+    mesma escala entre instâncias.
+
+    Args:
+        distance_matrix: Matriz de distâncias
+        p: Número de camadas
+        mixer: "parity" ou "ring"
+        initial_route: Se informado, parte dessa rota (estado de base) em
+            vez da superposição uniforme, ex.: a rota de solve_tsp_heuristic
+
+    Returns:
+        Função objective(params) -> float, com o atributo .statevector(params)
+        e .n
+    """
+    n = len(distance_matrix)
+    costs = subspace_tour_costs(distance_matrix)
+    phase_costs = costs / (float(np.max(np.abs(costs))) or 1.0)
+
+    initial_state = None
+    if initial_route is not None:
+        initial_state = np.zeros(len(costs), dtype=complex)
+        initial_state[permutation_rank(np.asarray([initial_route[:n]]))[0]] = 1.0
+
+    def statevector(params: np.ndarray) -> np.ndarray:
+        params = np.asarray(params, dtype=float)
+        return qaoa_xy_statevector(phase_costs, params[:p], params[p:], n, mixer, initial_state)
+
+    def objective(params: np.ndarray) -> float:
+        return float(np.dot(np.abs(statevector(params)) ** 2, costs))
+
+    objective.statevector = statevector
+    objective.n = n
+    return objective
+
+
+def sample_subspace_counts(psi: np.ndarray, n: int, shots: int, seed: Optional[int] = None) -> Dict[str, int]:
+    """
+    Amostra `shots` medições de um vetor do subespaço, no formato de
+    get_counts() do Qiskit para o registrador one-hot de n² qubits.
+    """
+    probs = np.abs(psi) ** 2
+    hits = np.random.default_rng(seed).multinomial(shots, probs / probs.sum())
+    ranks = np.flatnonzero(hits)
+    perms = permutation_unrank(ranks, n)
+    counts = {}
+    for rank, perm in zip(ranks, perms.tolist()):
+        state = sum(1 << (city * n + t) for t, city in enumerate(perm))
+        counts[format(state, f"0{n * n}b")] = int(hits[rank])
+    return counts
+
+
+def build_xy_qaoa_template(distance_matrix: List[List[float]],
+                           p: int,
+                           initial_route: Optional[Tuple[int, ...]] = None,
+                           measure: bool = True) -> "QuantumCircuit":
+    """
+    Circuito do QAOA com mixer XY "parity", executável no Aer ou em hardware.
+
+    Mesma evolução de qaoa_xy_statevector(mixer="parity") no registrador
+    one-hot (x_{i,t} → qubit i*n + t) mais um ancilla:
+        - estado inicial: a rota `initial_route` como estado de base (X nos
+          qubits da rota; padrão: 0, 1, ..., n-1). A superposição uniforme
+          das n! rotas, padrão do simulador, não é preparada aqui;
+        - fase: H_dist de build_tsp_ising(penalty=0) dividido pelo maior
+          custo de rota, como em make_subspace_objective (nas rotas
+          válidas difere só por fase global);
+        - mixer: exp(-iβ S_t) por grupo de _parity_groups, com S_t o produto
+          dos SWAPs entre as colunas t e t+1. Cada SWAP é diagonalizado por
+          CNOT + H (singleto → |11⟩), a paridade de Σ_c a_c·b_c é calculada
+          no ancilla por Toffolis, RZ(2β) aplica a fase e tudo é desfeito.
+          O mixer "ring" (exp de uma soma de termos que não comutam) fica
+          só no simulador de subespaço.
+
+    Args:
+        distance_matrix: Matriz de distâncias
+        p: Número de camadas
+        initial_route: Rota inicial (estado de base)
+        measure: Se True, mede os n² qubits da rota (não o ancilla)
+
+    Returns:
+        QuantumCircuit parametrizado (n² + 1 qubits), compatível com
+        bind_qaoa_parameters
+    """
+    if not QISKIT_AVAILABLE:
+        raise ImportError("Qiskit não disponível")
+
+    D = np.asarray(distance_matrix, dtype=float)
+    n = len(D)
+    N = n * n
+    ancilla = N
+    model = build_tsp_ising(D, penalty=0.0)
+    scale = float(np.max(np.abs(subspace_tour_costs(D)))) or 1.0
+    route = tuple(range(n)) if initial_route is None else tuple(initial_route[:n])
+
+    gammas = ParameterVector("γ", p)
+    betas = ParameterVector("β", p)
+    qc = QuantumCircuit(N + 1, N if measure else 0, name=f"qaoa_xy_tsp_p{p}")
+    for t, city in enumerate(route):
+        qc.x(city * n + t)
+
+    for layer in range(p):
+        for q, coef in enumerate(model["h"]):
+            if abs(coef) > 1e-10:
+                qc.rz(2 * coef / scale * gammas[layer], q)
+        for (q_i, q_j), coef in zip(model["J_indices"].tolist(), model["J_coeffs"]):
+            qc.cx(q_i, q_j)
+            qc.rz(2 * coef / scale * gammas[layer], q_j)
+            qc.cx(q_i, q_j)
+
+        for group in _parity_groups(n):
+            for t in group:
+                pairs = [(c * n + t, c * n + (t + 1) % n) for c in range(n)]
+                for a, b in pairs:
+                    qc.cx(a, b)
+                    qc.h(a)
+                for a, b in pairs:
+                    qc.ccx(a, b, ancilla)
+                qc.rz(2 * betas[layer], ancilla)
+                for a, b in pairs:
+                    qc.ccx(a, b, ancilla)
+                for a, b in pairs:
+                    qc.h(a)
+                    qc.cx(a, b)
+
+    if measure:
+        qc.measure(range(N), range(N))
+    return qc
+
+
+def solve_tsp_qaoa_xy(distance_matrix: List[List[float]],
+                      p: int = 1,
+                      maxiter: int = 100,
+                      seed: int = 42,
+                      shots: int = 4096,
+                      mixer: str = "parity",
+                      max_cities: int = SUBSPACE_MAX_CITIES,
+                      initial_route: Optional[Tuple[int, ...]] = None,
+                      parameter_store_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Resolve TSP com QAOA de mixer XY simulado no subespaço das n! rotas.
+
+    Mesmo formato de retorno de solve_tsp_qaoa. Para 6 cidades são 720
+    amplitudes em vez de 2^36. A otimização é só no simulador; o circuito
+    equivalente para Aer/hardware (mixer "parity", rota inicial de base)
+    é o de build_xy_qaoa_template. A otimização é a de
+    optimize_qaoa(mode="subspace"), sem modelo de qubits.
+
+    Args:
+        distance_matrix: Matriz de distâncias
+        p: Número de camadas
+        maxiter: Iterações máximas do COBYLA
+        seed: Seed da leitura final
+        shots: Shots da leitura final
+        mixer: "parity" ou "ring"
+        max_cities: Limite de n (n! amplitudes)
+        initial_route: Rota inicial (ver make_subspace_objective)
+        parameter_store_path: Arquivo JSON do store de parâmetros, como em
+            solve_tsp_qaoa_statevector
+
+    Returns:
+        Dicionário com resultados e tempos
+    """
+    start_time = time.time()
+    n_cities = len(distance_matrix)
+
+    if n_cities > max_cities:
+        return {
+            "success": False,
+            "error": f"{n_cities} cidades excede o limite de {max_cities} do simulador de subespaço",
+            "time": time.time() - start_time,
+        }
+
+    try:
+        store = load_parameter_store(parameter_store_path) if parameter_store_path else None
+        result = optimize_qaoa(None, distance_matrix, p=p, mode="subspace", mixer=mixer,
+                               maxiter=maxiter, shots=shots, seed=seed,
+                               parameter_store=store, initial_route=initial_route)
+        if store is not None:
+            save_parameter_store(store, parameter_store_path)
+        readout = result["readout"]
+        route = readout["best_route"]
+
+        return {
+            "success": True,
+            "route": route,
+            "cost": float(readout["best_cost"]) if route else float('inf'),
+            "time": time.time() - start_time,
+            "iterations": result["nfev"],
+            "fval": result["objective"],
+            "warm_start": result["warm_start"],
+            "valid_fraction": readout["valid_fraction"],
+            "params": result["params"].tolist(),
+            "encoding": "one_hot",
+            "mixer": mixer,
+        }
+
+    except Exception as e:
+        elapsed_time = time.time() - start_time
+        print(f"❌ Erro QAOA XY ({n_cities} cidades): {type(e).__name__}: {str(e)[:100]}")
+        return {
+            "success": False,
+            "error": str(e),
+            "time": elapsed_time
+        }
+
+
+# ============================================================================
+# 3.9 AJUSTE AUTOMÁTICO DA PENALIDADE A
+# ============================================================================
+
+# Candidatos do piloto, em múltiplos de tsp_penalty_bound
+PENALTY_PILOT_FACTORS = (1.1, 1.5, 2.0, 3.0, 5.0)
+
+
+def tsp_penalty_bound(distance_matrix: List[List[float]]) -> float:
+    """
+    Limite inferior de A a partir da matriz: max_i (max_j d_ji + max_k d_ik).
+
+    Violar uma restrição de cidade/tempo economiza no máximo as arestas de
+    entrada e saída de uma cidade e custa pelo menos A; acima desse valor o
+    estado fundamental é sempre uma rota válida. Costuma ser bem menor que
+    os valores fixos usados nos notebooks (max(D)·n + 1, 2·max(D)·n).
+    """
+    D = np.asarray(distance_matrix, dtype=float)
+    M = D.copy()
+    np.fill_diagonal(M, -np.inf)
+    return float(np.max(M.max(axis=0) + M.max(axis=1))) if len(D) > 1 else 1.0
+
+
+def tune_penalty(distance_matrix: List[List[float]],
+                 encoding: str = "one_hot",
+                 pilot: bool = False,
+                 factors: Iterable[float] = PENALTY_PILOT_FACTORS,
+                 p: int = 1,
+                 maxiter: int = 30,
+                 mode: str = "exact",
+                 max_qubits: int = 20) -> Dict[str, Any]:
+    """
+    Escolhe o fator de penalidade A do Hamiltoniano.
+
+    Sem piloto, A = factors[0]·tsp_penalty_bound (margem sobre o limite).
+    Com piloto, para cada A = fator·limite roda-se uma otimização curta do
+    QAOA (maxiter avaliações no simulador NumPy) e mede-se, na distribuição
+    exata final, fração válida × razão de aproximação (ótimo / custo médio
+    das rotas válidas); vence o maior produto. Penalidades grandes demais
+    achatam a paisagem de custo; pequenas demais deixam amplitude em
+    estados inválidos.
+
+    Args:
+        distance_matrix: Matriz de distâncias
+        encoding: Codificação (ver ENCODINGS)
+        pilot: Se True, faz o piloto (só quando cabe em max_qubits)
+        factors: Múltiplos do limite avaliados no piloto
+        p: Camadas do piloto
+        maxiter: Iterações do COBYLA por candidato
+        mode: Objetivo do piloto ("exact" ou "statevector")
+        max_qubits: Acima disso o piloto é pulado
+
+    Returns:
+        Dicionário com "penalty", "bound", "method" ("bound" ou "pilot") e,
+        com piloto, "pilot" (lista de candidatos avaliados)
+    """
+    factors = list(factors)
+    bound = tsp_penalty_bound(distance_matrix)
+    result = {"penalty": factors[0] * bound, "bound": bound, "method": "bound"}
 
-# ============================================================================
-# 2. FUNÇÕES CLÁSSICAS (BRUTE FORCE TSP)
-# ============================================================================
+    n = len(distance_matrix)
+    if not pilot or encoding_num_qubits(n, encoding) > max_qubits:
+        return result
+    if not SCIPY_AVAILABLE:
+        raise ImportError("SciPy não disponível para o piloto da penalidade")
 
-def calculate_route_cost(route: Tuple[int, ...], distance_matrix: List[List[float]]) -> float:
-    """Calcula o custo total de uma rota."""
-    cost = 0
-    for i in range(len(route) - 1):
-        cost += distance_matrix[route[i]][route[i + 1]]
-    return cost
+    states, costs, _ = tsp_cost_table(distance_matrix, encoding)
+    states = states.astype(np.intp)
+    optimal = float(costs.min())
+
+    trials = []
+    for factor in factors:
+        A = factor * bound
+        model = build_tsp_model(distance_matrix, encoding, penalty=A)
+        objective = make_qaoa_objective(model, distance_matrix, p, mode=mode)
+        params = minimize(objective, np.full(2 * p, 0.5), method="COBYLA", options={"maxiter": maxiter}).x
+        probs = np.abs(qaoa_statevector(ising_cost_diagonal(model), params[:p], params[p:])) ** 2
+        valid_fraction = float(probs[states].sum())
+        ratio = optimal * valid_fraction / float(probs[states] @ costs) if valid_fraction > 0 else 0.0
+        trials.append({
+            "penalty": A,
+            "valid_fraction": valid_fraction,
+            "approximation_ratio": ratio,
+            "score": valid_fraction * ratio,
+        })
 
+    best = max(trials, key=lambda trial: trial["score"])
+    result.update(penalty=best["penalty"], method="pilot", pilot=trials)
+    return result
 
-def solve_tsp_brute_force(distance_matrix: List[List[float]]) -> Tuple[float, Tuple[int, ...], float]:
+
+def _resolve_penalty(distance_matrix: List[List[float]],
+                     penalty: Any,
+                     encoding: str,
+                     **pilot_kwargs) -> Tuple[Optional[float], str]:
     """
-    Resolve TSP por força bruta (permutações).
-    
+    Interpreta o argumento `penalty` dos solvers.
+
+    None → padrão de build_tsp_model ("default"); número → valor fixo
+    ("fixed"); "bound" / "pilot" → tune_penalty.
+
     Returns:
-        (custo_ótimo, rota_ótima, tempo_execução)
+        (A ou None, método)
     """
-    start_time = time.time()
-    n = len(distance_matrix)
-    vertices = list(range(1, n))  # Começa do vértice 1
-    
-    min_cost = float('inf')
-    best_route = None
-    
-    for perm in itertools.permutations(vertices):
-        route = (0,) + perm + (0,)  # Volta ao início
-        cost = calculate_route_cost(route, distance_matrix)
-        
-        if cost < min_cost:
-            min_cost = cost
-            best_route = route
-    
-    elapsed_time = time.time() - start_time
-    return min_cost, best_route, elapsed_time
+    if penalty is None:
+        return None, "default"
+    if isinstance(penalty, str):
+        if penalty not in ("bound", "pilot"):
+            raise ValueError(f"Penalidade desconhecida: {penalty} (use um número, 'bound' ou 'pilot')")
+        tuned = tune_penalty(distance_matrix, encoding, pilot=penalty == "pilot", **pilot_kwargs)
+        return tuned["penalty"], tuned["method"]
+    return float(penalty), "fixed"
 
 
 # ============================================================================
-# 3. FUNÇÕES QUÂNTICAS (QAOA)
+# 3.10 EXECUÇÃO EM LOTE NO HARDWARE (SAMPLERV2 COM VÁRIOS PUBS)
 # ============================================================================
 
-def interpret_tsp_solution(x_array: np.ndarray, n_cities: int) -> Tuple[int, ...]:
+def _hardware_model(params: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Decodifica a solução binária do QAOA em uma rota TSP.
-    
-    A codificação é: x[i*n + t] representa se a cidade i está na posição t da rota.
+    Modelo de Ising de uma instância de executar_ibm_quantum.
+
+    Usa params["model"] se existir; senão h/J no formato de dicionários dos
+    notebooks (como em ising_to_dicts); senão constrói a partir de "D"
+    (build_tsp_model, com "encoding"/"penalty" opcionais).
     """
-    try:
-        route = []
-        for t in range(n_cities):
-            for i in range(n_cities):
-                if x_array[i * n_cities + t] >= 0.5:  # Threshold para arredondar
-                    route.append(i)
-                    break
-        
-        # Validar se é uma rota válida
-        if len(set(route)) == n_cities and len(route) == n_cities:
-            return tuple(route) + (route[0],)
-        else:
-            return None
-    except Exception as e:
-        print(f"Erro na decodificação: {e}")
-        return None
+    if "model" in params:
+        return params["model"]
+    if "h" in params and "J" in params:
+        h, J = params["h"], params["J"]
+        num_qubits = len(params["D"]) ** 2
+        pairs = sorted((min(a, b), max(a, b), c) for (a, b), c in J.items())
+        return {
+            "h": np.array([h.get(q, 0.0) for q in range(num_qubits)]),
+            "J_indices": np.array([(a, b) for a, b, _ in pairs], dtype=np.int64).reshape(-1, 2),
+            "J_coeffs": np.array([c for _, _, c in pairs]),
+            "num_qubits": num_qubits,
+            "encoding": "one_hot",
+        }
+    return build_tsp_model(params["D"], params.get("encoding", "one_hot"), penalty=params.get("penalty"))
 
 
-def solve_tsp_qaoa(distance_matrix: List[List[float]], 
-                   p: int = 1,
-                   maxiter: int = 100,
-                   seed: int = 42) -> Dict[str, Any]:
+def submit_qaoa_hardware_batch(backend: Any,
+                               parametros: Dict[Any, Dict[str, Any]],
+                               shots: int = 4096,
+                               sampler: Any = None,
+                               execution_mode: str = "job",
+                               optimization_level: int = 3,
+                               transpile_workers: Optional[int] = None,
+                               max_pubs_per_job: Optional[int] = None) -> Dict[str, Any]:
     """
-    Resolve TSP usando QAOA (Quantum Approximate Optimization Algorithm).
-    
+    Monta, transpila e envia de uma vez os circuitos QAOA de várias instâncias.
+
+    Versão em lote de executar_ibm_quantum dos notebooks: em vez de um job
+    por instância, esperando cada um antes do próximo, todos os circuitos
+    são transpilados juntos (transpile em paralelo) e enviados como PUBs de
+    um único job SamplerV2 (ou de poucos jobs, se max_pubs_per_job limitar).
+    A espera na fila é paga uma vez; os resultados são lidos por
+    collect_qaoa_hardware_batch.
+
     Args:
-        distance_matrix: Matriz de distâncias
-        p: Número de camadas do QAOA (reps)
-        maxiter: Iterações máximas do otimizador clássico
-        seed: Seed para reprodutibilidade
-        
+        backend: Backend IBM, fake backend ou AerSimulator
+        parametros: {id: {"D", "gammas", "betas", ...}}, como nos notebooks
+            (ver _hardware_model para o modelo)
+        shots: Shots por circuito
+        sampler: SamplerV2 já configurado (ex.: qiskit_aer.primitives.SamplerV2
+            para testes locais); se None, cria o SamplerV2 do Qiskit Runtime
+            (requer qiskit-ibm-runtime)
+        execution_mode: Com sampler=None: "job" (direto no backend),
+            "batch" (Batch do Runtime) ou "session"
+        optimization_level: Nível de otimização do transpile
+        transpile_workers: Processos do transpile (padrão do Qiskit)
+        max_pubs_per_job: Máximo de circuitos por job (padrão: todos em um)
+
     Returns:
-        Dicionário com resultados, circuito, e tempos
+        Handle com "jobs" [(job, ids)], "instances", "backend",
+        "transpile_time" e "submitted_at"
     """
     if not QISKIT_AVAILABLE:
-        return {"error": "Qiskit não disponível"}
-    
-    start_time = time.time()
-    n_cities = len(distance_matrix)
-    
-    try:
-        # Criar problema TSP
-        tsp_problem = Tsp(distance_matrix)
-        qubo = tsp_problem.to_quadratic_program()
-        
-        # Configurar QAOA
-        sampler = StatevectorSampler(seed=seed)
-        optimizer = COBYLA(maxiter=maxiter, tol=1e-5)
-        qaoa = QAOA(sampler=sampler, optimizer=optimizer, reps=p)
-        
-        # Executar otimização
-        meo = MinimumEigenOptimizer(qaoa)
-        result = meo.solve(qubo)
-        
-        # Decodificar resultado
-        route = interpret_tsp_solution(result.x, n_cities)
-        cost = result.fval if route else float('inf')
-        
-        elapsed_time = time.time() - start_time
-        
-        return {
-            "success": True,
-            "route": route,
-            "cost": float(cost),
-            "time": elapsed_time,
-            "iterations": optimizer.settings.get("maxiter", maxiter),
-            "fval": float(result.fval),
-            "x": result.x
-        }
-        
-    except Exception as e:
-        elapsed_time = time.time() - start_time
-        print(f"❌ Erro QAOA ({n_cities} cidades): {type(e).__name__}: {str(e)[:100]}")
-        return {
-            "success": False,
-            "error": str(e),
-            "time": elapsed_time
+        raise ImportError("Qiskit não disponível")
+
+    instances = {}
+    circuits = []
+    for instance_id, params in parametros.items():
+        model = _hardware_model(params)
+        gammas, betas = np.atleast_1d(params["gammas"]), np.atleast_1d(params["betas"])
+        template = build_qaoa_template(model, len(gammas))
+        circuits.append(bind_qaoa_parameters(template, np.concatenate([gammas, betas])))
+        instances[instance_id] = {
+            "D": np.asarray(params["D"], dtype=float),
+            "encoding": model.get("encoding", "one_hot"),
+            "num_qubits": model["num_qubits"],
         }
 
+    t0 = time.time()
+    transpiled = transpile(circuits, backend=backend, optimization_level=optimization_level,
+                           num_processes=transpile_workers)
+    transpile_time = time.time() - t0
+    for info, circuit in zip(instances.values(), transpiled):
+        info["depth"] = circuit.depth()
+
+    context = None
+    if sampler is None:
+        if not RUNTIME_AVAILABLE:
+            raise ImportError("qiskit-ibm-runtime não disponível; passe um `sampler` (ex.: SamplerV2 do Aer)")
+        if execution_mode == "job":
+            sampler = RuntimeSampler(mode=backend)
+        elif execution_mode in ("batch", "session"):
+            context = (Batch if execution_mode == "batch" else Session)(backend=backend)
+            sampler = RuntimeSampler(mode=context)
+        else:
+            raise ValueError(f"Modo de execução desconhecido: {execution_mode} (use 'job', 'batch' ou 'session')")
+
+    ids = list(instances)
+    chunk = max_pubs_per_job or len(ids)
+    jobs = []
+    submitted_at = time.time()
+    for start in range(0, len(ids), chunk):
+        job = sampler.run(transpiled[start:start + chunk], shots=shots)
+        jobs.append((job, ids[start:start + chunk]))
+    if context is not None:
+        # Jobs já enviados continuam; o contexto só deixa de aceitar novos
+        context.close()
+
+    return {
+        "jobs": jobs,
+        "instances": instances,
+        "backend": getattr(backend, "name", str(backend)),
+        "shots": shots,
+        "transpile_time": transpile_time,
+        "submitted_at": submitted_at,
+    }
+
+
+def collect_qaoa_hardware_batch(handle: Dict[str, Any],
+                                reference_solver: str = "held_karp",
+                                poll_interval: float = 1.0) -> Iterator[Dict[str, Any]]:
+    """
+    Lê os resultados de submit_qaoa_hardware_batch à medida que os jobs terminam.
+
+    Cada PUB é processado direto do BitArray (process_counts, sem passar
+    por get_counts) e comparado com o ótimo de `reference_solver`,
+    calculado para todas as instâncias antes de começar a coleta.
+    "gap_percent" é None quando o ótimo é 0 (gap relativo indefinido).
+
+    Yields:
+        Um registro por instância, com "instance_id", "n_cities",
+        "num_qubits", "backend", "optimal_route", "optimal_cost", "route",
+        "cost", "gap_percent", "valid_fraction", "expected_cost", "shots",
+        "depth", "job_id", "transpile_time" e "wait_time"
+    """
+    # Ótimos de referência calculados enquanto os jobs já estão na fila, e
+    # não dentro do laço de coleta, que ficaria parado durante o solver
+    solve_reference = CLASSICAL_SOLVERS[reference_solver]
+    references = {}
+    for instance_id, info in handle["instances"].items():
+        optimal_cost, optimal_route, _ = solve_reference(info["D"])
+        references[instance_id] = (optimal_cost, optimal_route)
+
+    pending = list(handle["jobs"])
+    while pending:
+        finished = [entry for entry in pending if not hasattr(entry[0], "done") or entry[0].done()]
+        if not finished:
+            time.sleep(poll_interval)
+            continue
+        for entry in finished:
+            pending.remove(entry)
+            job, ids = entry
+            result = job.result()
+            wait_time = time.time() - handle["submitted_at"]
+            for instance_id, pub_result in zip(ids, result):
+                info = handle["instances"][instance_id]
+                D = info["D"]
+                readout = process_counts(pub_result.data.meas, D, encoding=info["encoding"])
+                optimal_cost, optimal_route = references[instance_id]
+                route = readout["best_route"]
+                if not route:
+                    gap = float('inf')
+                else:
+                    gap = (readout["best_cost"] - optimal_cost) / optimal_cost * 100 if optimal_cost else None
+                yield {
+                    "instance_id": instance_id,
+                    "n_cities": len(D),
+                    "num_qubits": info["num_qubits"],
+                    "backend": handle["backend"],
+                    "optimal_route": optimal_route,
+                    "optimal_cost": float(optimal_cost),
+                    "route": route,
+                    "cost": readout["best_cost"],
+                    "gap_percent": gap,
+                    "valid_fraction": readout["valid_fraction"],
+                    "expected_cost": readout["expected_cost"],
+                    "shots": handle["shots"],
+                    "depth": info["depth"],
+                    "job_id": job.job_id(),
+                    "transpile_time": handle["transpile_time"],
+                    "wait_time": wait_time,
+                }
+
+
+def run_qaoa_hardware_batch(backend: Any,
+                            parametros: Dict[Any, Dict[str, Any]],
+                            shots: int = 4096,
+                            reference_solver: str = "held_karp",
+                            **kwargs) -> List[Dict[str, Any]]:
+    """
+    submit_qaoa_hardware_batch seguido de collect_qaoa_hardware_batch.
+
+    Returns:
+        Lista de registros, um por instância (ordem de término dos jobs)
+    """
+    print(f"\n{'='*70}")
+    print(f"☁️  EXECUÇÃO EM LOTE: {getattr(backend, 'name', backend)} ({len(parametros)} circuitos)")
+    print(f"{'='*70}")
+    handle = submit_qaoa_hardware_batch(backend, parametros, shots=shots, **kwargs)
+    print(f"   🔧 Transpilação: {handle['transpile_time']:.2f}s")
+    print(f"   🚀 Jobs enviados: {', '.join(job.job_id() for job, _ in handle['jobs'])}")
+
+    records = []
+    for record in collect_qaoa_hardware_batch(handle, reference_solver):
+        print(f"   ✅ {record['n_cities']} cidades: custo {record['cost']} "
+              f"(ótimo {record['optimal_cost']}), válidas {100 * record['valid_fraction']:.2f}%")
+        records.append(record)
+    return records
+
+
+# Solvers quânticos selecionáveis em main()
+QUANTUM_SOLVERS = {
+    "qiskit": solve_tsp_qaoa,
+    "statevector": solve_tsp_qaoa_statevector,
+    "annealing": solve_tsp_annealing,
+    "xy_mixer": solve_tsp_qaoa_xy,
+}
+
 
 # ============================================================================
 # 4. ANÁLISE E COMPARAÇÃO
@@ -203,6 +3378,8 @@ def analyze_results(n_cities: int,
             "speedup": speedup,
             "quantum_route": quantum_result.get("route"),
         })
+        if "penalty" in quantum_result:
+            analysis["penalty"] = quantum_result["penalty"]
     else:
         analysis.update({
             "quantum_cost": "N/A",
@@ -304,10 +3481,518 @@ def create_comparison_visualizations(results_list: List[Dict[str, Any]]):
 
 
 # ============================================================================
-# 5. EXECUÇÃO PRINCIPAL
+# 5. EXECUÇÃO EM LOTE
+# ============================================================================
+
+def load_instances(paths: Iterable[str]) -> Iterator[Tuple[str, np.ndarray]]:
+    """
+    Lê matrizes de distâncias de arquivos, sob demanda.
+
+    Formatos: .npy; .json com uma matriz, {"distance_matrix": matriz} ou
+    {id: matriz}; qualquer outro como texto (np.loadtxt, separado por
+    vírgula ou espaço). Diretórios são percorridos em ordem alfabética.
+
+    Yields:
+        (instance_id, matriz)
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            entries = sorted(os.path.join(path, name) for name in os.listdir(path))
+            yield from load_instances(entries)
+            continue
+
+        stem = os.path.splitext(os.path.basename(path))[0]
+        if path.endswith(".npy"):
+            yield stem, np.load(path)
+        elif path.endswith(".json"):
+            with open(path) as f:
+                data = json.load(f)
+            if isinstance(data, dict) and "distance_matrix" in data:
+                yield stem, np.asarray(data["distance_matrix"], dtype=float)
+            elif isinstance(data, dict):
+                for key, matrix in data.items():
+                    yield f"{stem}/{key}", np.asarray(matrix, dtype=float)
+            else:
+                yield stem, np.asarray(data, dtype=float)
+        else:
+            with open(path) as f:
+                delimiter = "," if "," in f.readline() else None
+            yield stem, np.loadtxt(path, delimiter=delimiter, ndmin=2)
+
+
+def _cache_options(solve: Any, cache_dir: Optional[str]) -> Dict[str, Any]:
+    """{"cache_dir": cache_dir} se o solver aceita cache; {} caso contrário."""
+    if cache_dir is None or "cache_dir" not in inspect.signature(solve).parameters:
+        return {}
+    return {"cache_dir": cache_dir}
+
+
+def _accepted_options(solve: Any, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Subconjunto de `options` que o solver aceita (ex.: p/maxiter só no QAOA)."""
+    parameters = inspect.signature(solve).parameters
+    return {k: v for k, v in options.items() if k in parameters}
+
+
+def _classical_job(solver: str, distance_matrix: np.ndarray,
+                   cache_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Executa um solver de CLASSICAL_SOLVERS em um worker."""
+    stats = {}
+    solve = CLASSICAL_SOLVERS[solver]
+    cost, route, elapsed = solve(distance_matrix, stats=stats, **_cache_options(solve, cache_dir))
+    return {"cost": float(cost), "route": route, "time": elapsed, "stats": stats}
+
+
+def _quantum_job(solver: str, distance_matrix: np.ndarray, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Executa um solver de QUANTUM_SOLVERS em um worker."""
+    return QUANTUM_SOLVERS[solver](distance_matrix, **options)
+
+
+def _split_instance(index: int, item: Any) -> Tuple[Any, Any]:
+    """
+    Separa (instance_id, matriz) de um item do lote.
+
+    Um item é um par só se for uma tupla de 2 elementos com id escalar e
+    matriz 2-D; assim uma matriz 2×2 passada como tupla de linhas não é
+    confundida com um par.
+    """
+    if (isinstance(item, tuple) and len(item) == 2
+            and np.ndim(item[0]) == 0 and np.ndim(item[1]) == 2):
+        return item
+    return index, item
+
+
+def run_tsp_batch(instances: Iterable[Any],
+                  classical_solver: str = "held_karp",
+                  quantum_solver: Optional[str] = "statevector",
+                  classical_workers: int = 2,
+                  quantum_workers: int = 2,
+                  quantum_options: Optional[Dict[str, Any]] = None,
+                  max_in_flight: Optional[int] = None,
+                  cache_dir: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Resolve muitas instâncias em paralelo, emitindo resultados ao terminar.
+
+    Jobs clássicos e quânticos rodam em pools de processos separados, com
+    concorrência configurável em cada um. As instâncias são consumidas do
+    iterável sob demanda (no máximo `max_in_flight` em andamento), então
+    geradores e load_instances funcionam para lotes de qualquer tamanho.
+
+    Args:
+        instances: Iterável de pares (instance_id, matriz 2-D) ou de
+            matrizes (o id passa a ser a posição); ids repetidos levantam
+            ValueError
+        classical_solver: Chave de CLASSICAL_SOLVERS
+        quantum_solver: Chave de QUANTUM_SOLVERS, ou None para pular o QAOA
+        classical_workers: Processos do pool clássico
+        quantum_workers: Processos do pool quântico
+        quantum_options: kwargs do solver quântico (p, maxiter, ...)
+        max_in_flight: Instâncias simultâneas (padrão: 2 × total de workers)
+        cache_dir: Cache de soluções (ex.: CACHE_DIR) repassado aos solvers
+            que o aceitam; None desativa
+
+    Yields:
+        Registros com "instance_id" e "kind":
+            "classical" — custo, rota, tempo e stats do solver clássico
+            "quantum"   — dicionário do solver quântico
+            "analysis"  — analyze_results, quando ambos terminam
+    """
+    quantum_options = dict(quantum_options or {})
+    if quantum_solver:
+        quantum_options = dict(_cache_options(QUANTUM_SOLVERS[quantum_solver], cache_dir), **quantum_options)
+    max_in_flight = max_in_flight or 2 * (classical_workers + quantum_workers)
+    source = iter(enumerate(instances))
+
+    pending = {}   # future → (instance_id, kind)
+    partial = {}   # instance_id → {"n_cities", "classical", "quantum"}
+    seen_ids = set()
+
+    classical_pool = ProcessPoolExecutor(max_workers=classical_workers)
+    quantum_pool = ProcessPoolExecutor(max_workers=quantum_workers) if quantum_solver else None
+    try:
+        exhausted = False
+        while True:
+            # Completar a janela de instâncias em andamento
+            while not exhausted and len(partial) < max_in_flight:
+                try:
+                    index, item = next(source)
+                except StopIteration:
+                    exhausted = True
+                    break
+                instance_id, matrix = _split_instance(index, item)
+                if instance_id in seen_ids:
+                    raise ValueError(f"instance_id duplicado no lote: {instance_id!r}")
+                seen_ids.add(instance_id)
+                D = np.asarray(matrix, dtype=float)
+                partial[instance_id] = {"n_cities": len(D)}
+                future = classical_pool.submit(_classical_job, classical_solver, D, cache_dir)
+                pending[future] = (instance_id, "classical")
+                if quantum_pool is not None:
+                    future = quantum_pool.submit(_quantum_job, quantum_solver, D, quantum_options)
+                    pending[future] = (instance_id, "quantum")
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                instance_id, kind = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"success": False, "error": f"{type(e).__name__}: {e}"}
+                yield {"instance_id": instance_id, "kind": kind, **result}
+
+                state = partial[instance_id]
+                state[kind] = result
+                expected = ("classical", "quantum") if quantum_pool is not None else ("classical",)
+                if all(k in state for k in expected):
+                    del partial[instance_id]
+                    classical = state["classical"]
+                    if quantum_pool is not None and "cost" in classical:
+                        analysis = analyze_results(state["n_cities"], classical["cost"],
+                                                   classical["time"], state["quantum"])
+                        yield {"instance_id": instance_id, "kind": "analysis", **analysis}
+    finally:
+        classical_pool.shutdown(wait=False, cancel_futures=True)
+        if quantum_pool is not None:
+            quantum_pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _json_default(obj: Any) -> Any:
+    """Serialização de tipos NumPy (e afins) para JSON."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return str(obj)
+
+
+def append_result(path: str, record: Dict[str, Any]):
+    """
+    Acrescenta um registro ao arquivo JSON Lines e força a gravação em disco.
+
+    Cada registro é uma linha completa; uma interrupção perde no máximo a
+    linha em escrita. Se o arquivo terminar em uma linha truncada, ela é
+    encerrada com uma quebra de linha antes do novo registro, para que load_results
+    descarte só a linha truncada e não o registro seguinte.
+    """
+    line = json.dumps(record, default=_json_default)
+    with open(path, 'ab+') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+        f.write((line + "\n").encode())
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def load_results(path: str) -> List[Dict[str, Any]]:
+    """Lê os registros de um arquivo JSON Lines, ignorando linhas truncadas."""
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def run_config(classical_solver: str,
+               quantum_solver: Optional[str],
+               quantum_options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Configuração que produziu um registro, normalizada como em JSON.
+
+    Gravada em cada registro para que a retomada só reaproveite resultados
+    dos mesmos solvers e opções.
+    """
+    config = {"classical_solver": classical_solver, "quantum_solver": quantum_solver,
+              "quantum_options": dict(quantum_options or {})}
+    return json.loads(json.dumps(config, sort_keys=True, default=_json_default))
+
+
+def completed_instance_ids(path: str, kind: Optional[str] = None,
+                           config: Optional[Dict[str, Any]] = None) -> set:
+    """
+    Ids de instâncias já gravadas (opcionalmente, só registros de `kind`
+    e só os produzidos pela `config` de run_config).
+    """
+    return {r["instance_id"] for r in load_results(path)
+            if "instance_id" in r and (kind is None or r.get("kind") == kind)
+            and (config is None or r.get("config") == config)}
+
+
+def run_tsp_batch_to_jsonl(instances: Iterable[Any], path: str, **kwargs) -> Iterator[Dict[str, Any]]:
+    """
+    run_tsp_batch com gravação incremental e retomada.
+
+    Cada registro é gravado em `path` (append_result) assim que emitido,
+    com a "config" (run_config) que o produziu. Ao reiniciar, instâncias
+    cujo registro final já está no arquivo ("analysis", ou "classical"
+    quando quantum_solver=None) com a mesma config são puladas; registros
+    de outros solvers ou opções não contam como concluídos.
+
+    Args:
+        instances: Como em run_tsp_batch
+        path: Arquivo JSON Lines de saída
+        **kwargs: Repassados a run_tsp_batch
+
+    Yields:
+        Os registros de run_tsp_batch das instâncias ainda não concluídas
+    """
+    quantum_solver = kwargs.get("quantum_solver", "statevector")
+    config = run_config(kwargs.get("classical_solver", "held_karp"), quantum_solver,
+                        kwargs.get("quantum_options") if quantum_solver else None)
+    final_kind = "analysis" if quantum_solver else "classical"
+    done = completed_instance_ids(path, final_kind, config)
+
+    def remaining() -> Iterator[Tuple[Any, Any]]:
+        for index, item in enumerate(instances):
+            instance_id, matrix = _split_instance(index, item)
+            if instance_id not in done:
+                yield instance_id, matrix
+
+    for record in run_tsp_batch(remaining(), **kwargs):
+        record = dict(record, config=config)
+        append_result(path, record)
+        yield record
+
+
+# ============================================================================
+# 5.1 BENCHMARK DE ESCALABILIDADE
+# ============================================================================
+
+INSTANCE_KINDS = ("symmetric", "asymmetric", "euclidean")
+
+# Maior instância em que cada solver entra no benchmark por padrão
+BENCHMARK_MAX_CITIES = {
+    "brute_force": 9,
+    "brute_force_vectorized": 10,
+    "brute_force_parallel": 10,
+    "held_karp": 14,
+    "branch_and_bound": 12,
+    "heuristic": 500,
+    "qiskit": 3,
+    "statevector": 4,
+    "annealing": 7,
+    "xy_mixer": 8,
+}
+
+
+def generate_instance(n: int, kind: str = "symmetric", seed: Optional[int] = None,
+                      low: int = 1, high: int = 100) -> np.ndarray:
+    """
+    Gera uma matriz de distâncias aleatória.
+
+    Args:
+        n: Número de cidades
+        kind: "symmetric" / "asymmetric" (inteiros em [low, high)) ou
+            "euclidean" (pontos no quadrado [0, high)², distância euclidiana)
+        seed: Seed do gerador
+        low, high: Faixa dos pesos
+
+    Returns:
+        Matriz (n, n) float com diagonal zero
+    """
+    rng = np.random.default_rng(seed)
+    if kind == "symmetric":
+        W = rng.integers(low, high, size=(n, n)).astype(float)
+        D = np.triu(W, 1) + np.triu(W, 1).T
+    elif kind == "asymmetric":
+        D = rng.integers(low, high, size=(n, n)).astype(float)
+    elif kind == "euclidean":
+        points = rng.uniform(0, high, size=(n, 2))
+        D = np.linalg.norm(points[:, None, :] - points[None, :, :], axis=-1)
+    else:
+        raise ValueError(f"Tipo de instância desconhecido: {kind} (use um de {INSTANCE_KINDS})")
+    np.fill_diagonal(D, 0.0)
+    return D
+
+
+def _run_solver(name: str, distance_matrix: np.ndarray, options: Dict[str, Any]) -> Tuple[float, bool]:
+    """Executa um solver de CLASSICAL_SOLVERS ou QUANTUM_SOLVERS → (custo, sucesso)."""
+    if name in CLASSICAL_SOLVERS:
+        cost, _, _ = CLASSICAL_SOLVERS[name](distance_matrix, **options)
+        return float(cost), True
+    result = QUANTUM_SOLVERS[name](distance_matrix, **options)
+    success = bool(result.get("success")) and result.get("route") is not None
+    return (float(result["cost"]) if success else float('inf')), success
+
+
+def benchmark_solvers(solvers: Iterable[str] = ("brute_force", "held_karp", "branch_and_bound"),
+                      sizes: Iterable[int] = range(4, 10),
+                      kinds: Iterable[str] = INSTANCE_KINDS,
+                      instances_per_size: int = 3,
+                      trials: int = 5,
+                      warmups: int = 1,
+                      seed: int = 0,
+                      reference: str = "held_karp",
+                      solver_options: Optional[Dict[str, Dict[str, Any]]] = None,
+                      max_cities: Optional[Dict[str, int]] = None,
+                      output_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Mede tempo, memória e qualidade dos solvers em instâncias aleatórias.
+
+    Para cada (tipo, tamanho, instância) o custo ótimo vem do solver
+    `reference`; cada solver roda `warmups` vezes sem medição, depois
+    `trials` vezes cronometradas com perf_counter. O pico de memória é
+    medido com tracemalloc numa execução separada, fora das cronometradas.
+
+    Args:
+        solvers: Chaves de CLASSICAL_SOLVERS / QUANTUM_SOLVERS
+        sizes: Números de cidades
+        kinds: Tipos de instância (ver generate_instance)
+        instances_per_size: Instâncias por (tipo, tamanho)
+        trials: Execuções cronometradas por instância
+        warmups: Execuções descartadas antes das medições
+        seed: Seed base (cada instância recebe uma seed derivada)
+        reference: Solver exato usado como custo ótimo
+        solver_options: {solver: kwargs} repassados a cada solver
+        max_cities: {solver: n máximo}; padrão BENCHMARK_MAX_CITIES
+        output_path: JSON de saída (padrão: OUTPUT_DIR/benchmark.json)
+
+    Returns:
+        {"metadata": {...}, "results": [registro por solver × instância]}
+    """
+    solver_options = solver_options or {}
+    limits = dict(BENCHMARK_MAX_CITIES, **(max_cities or {}))
+    output_path = output_path or f"{OUTPUT_DIR}/benchmark.json"
+    solvers, kinds = list(solvers), list(kinds)
+
+    records = []
+    for kind_index, kind in enumerate(kinds):
+        for n in sizes:
+            for index in range(instances_per_size):
+                instance_seed = int(np.random.SeedSequence([seed, kind_index, n, index]).generate_state(1)[0])
+                D = generate_instance(n, kind, seed=instance_seed)
+                optimal_cost, _ = _run_solver(reference, D, solver_options.get(reference, {}))
+
+                for name in solvers:
+                    if n > limits.get(name, n):
+                        continue
+                    options = solver_options.get(name, {})
+
+                    for _ in range(warmups):
+                        _run_solver(name, D, options)
+
+                    times = []
+                    for _ in range(trials):
+                        t0 = time.perf_counter()
+                        cost, success = _run_solver(name, D, options)
+                        times.append(time.perf_counter() - t0)
+
+                    tracemalloc.start()
+                    try:
+                        _run_solver(name, D, options)
+                        _, peak = tracemalloc.get_traced_memory()
+                    finally:
+                        tracemalloc.stop()
+
+                    ratio = cost / optimal_cost if success and optimal_cost > 0 else None
+                    records.append({
+                        "solver": name,
+                        "kind": kind,
+                        "n_cities": n,
+                        "instance": index,
+                        "seed": instance_seed,
+                        "times": times,
+                        "median_time": float(np.median(times)),
+                        "p95_time": float(np.percentile(times, 95)),
+                        "min_time": float(np.min(times)),
+                        "peak_memory_bytes": int(peak),
+                        "cost": cost if success else None,
+                        "optimal_cost": optimal_cost,
+                        "approximation_ratio": ratio,
+                        "success": success,
+                    })
+                    print(f"  {name:<24} {kind:<10} n={n:<3} #{index}  "
+                          f"mediana={records[-1]['median_time']:.6f}s  pico={peak / 1024:.1f} KiB")
+
+    report = {
+        "metadata": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "trials": trials,
+            "warmups": warmups,
+            "seed": seed,
+            "reference": reference,
+            "solver_options": solver_options,
+        },
+        "results": records,
+    }
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2, default=_json_default)
+    print(f"✓ Benchmark (JSON): {output_path}")
+    return report
+
+
+def fit_scaling(records: List[Dict[str, Any]], solver: str, kind: Optional[str] = None) -> Dict[str, float]:
+    """
+    Ajusta curvas empíricas de escala à mediana dos tempos.
+
+    Exponencial: t ≈ a·bⁿ (reta em log t × n). Polinomial: t ≈ c·nᵏ
+    (reta em log t × log n).
+
+    Args:
+        records: Registros de benchmark_solvers(...)["results"]
+        solver: Solver a ajustar
+        kind: Restringe a um tipo de instância (padrão: todos)
+
+    Returns:
+        {"exp_base": b, "poly_degree": k, "sizes": número de tamanhos distintos}
+    """
+    rows = [r for r in records if r["solver"] == solver and (kind is None or r["kind"] == kind)]
+    sizes = sorted({r["n_cities"] for r in rows})
+    if len(sizes) < 2:
+        raise ValueError("São necessários pelo menos dois tamanhos para o ajuste")
+    n = np.array(sizes, dtype=float)
+    t = np.array([np.median([r["median_time"] for r in rows if r["n_cities"] == s]) for s in sizes])
+    log_t = np.log(np.maximum(t, 1e-12))
+    return {
+        "exp_base": float(np.exp(np.polyfit(n, log_t, 1)[0])),
+        "poly_degree": float(np.polyfit(np.log(n), log_t, 1)[0]),
+        "sizes": len(sizes),
+    }
+
+
+# ============================================================================
+# 6. EXECUÇÃO PRINCIPAL
 # ============================================================================
 
-def main():
+def main(classical_solver: str = "brute_force", quantum_solver: str = "qiskit", resume: bool = False,
+         use_cache: bool = False):
+    """
+    Executa a comparação completa.
+
+    Cada instância é gravada em tsp_results.jsonl assim que termina; os
+    arquivos CSV/JSON/Pickle do final são gerados a partir desses registros.
+
+    Args:
+        classical_solver: Chave de CLASSICAL_SOLVERS usada como referência
+            ("brute_force", "brute_force_vectorized", "brute_force_parallel",
+            "held_karp", "branch_and_bound" ou "heuristic")
+        quantum_solver: Chave de QUANTUM_SOLVERS ("qiskit", "statevector",
+            "annealing" ou "xy_mixer"); p=1 e maxiter=50 só são repassados
+            aos solvers que os aceitam
+        resume: Se True, reaproveita as instâncias já gravadas em
+            tsp_results.jsonl pela mesma configuração (solvers e opções);
+            se False, começa um arquivo novo
+        use_cache: Se True, os solvers que aceitam cache usam CACHE_DIR
+    """
+    solve_classical = CLASSICAL_SOLVERS[classical_solver]
+    solve_quantum = QUANTUM_SOLVERS[quantum_solver]
+    cache_dir = CACHE_DIR if use_cache else None
+    quantum_options = _accepted_options(solve_quantum, {"p": 1, "maxiter": 50})
+    config = run_config(classical_solver, quantum_solver, quantum_options)
+
     print("=" * 80)
     print("SOLUÇÃO COMPLETA: TSP CLÁSSICO vs QAOA")
     print("=" * 80)
@@ -315,8 +4000,30 @@ def main():
     results = []
     all_routes = {}
     
+    # Resultados incrementais (retomada após interrupção)
+    stream_path = f"{OUTPUT_DIR}/tsp_results.jsonl"
+    if not resume and os.path.exists(stream_path):
+        os.remove(stream_path)
+    finished = {}
+    for record in load_results(stream_path):
+        if record.pop("config", None) == config:
+            finished[record["instance_id"]] = record
+    for n_cities, record in finished.items():
+        quantum_route = record.get("quantum_route")
+        record["quantum_route"] = tuple(quantum_route) if quantum_route is not None else None
+        all_routes[n_cities] = {
+            "classical": tuple(record.pop("classical_route")),
+            "quantum": record["quantum_route"],
+        }
+        record.pop("instance_id")
+        results.append(record)
+    
     # Processar cada tamanho de problema
     for n_cities in sorted(GRAPHS.keys()):
+        if n_cities in finished:
+            print(f"\n↺ {n_cities} cidades já processadas em {stream_path}, pulando")
+            continue
+        
         print(f"\n{'='*80}")
         print(f"PROCESSANDO: {n_cities} CIDADES")
         print(f"{'='*80}")
@@ -324,15 +4031,21 @@ def main():
         distance_matrix = GRAPHS[n_cities]
         
         # --- SOLUÇÃO CLÁSSICA ---
-        print("\n[1/2] Executando Brute Force Clássico...")
-        classical_cost, classical_route, classical_time = solve_tsp_brute_force(distance_matrix)
+        print(f"\n[1/2] Executando solver clássico ({classical_solver})...")
+        classical_stats = {}
+        classical_cost, classical_route, classical_time = solve_classical(
+            distance_matrix, stats=classical_stats, **_cache_options(solve_classical, cache_dir)
+        )
         print(f"     ✓ Rota ótima: {classical_route}")
         print(f"     ✓ Custo: {classical_cost:.4f}")
         print(f"     ✓ Tempo: {classical_time:.6f}s")
+        for key, value in classical_stats.items():
+            print(f"     ✓ {key}: {value:.4f}" if isinstance(value, float) else f"     ✓ {key}: {value}")
         
         # --- SOLUÇÃO QUÂNTICA ---
-        print("\n[2/2] Executando QAOA...")
-        quantum_result = solve_tsp_qaoa(distance_matrix, p=1, maxiter=50)
+        print(f"\n[2/2] Executando QAOA ({quantum_solver})...")
+        quantum_result = solve_quantum(distance_matrix, **quantum_options,
+                                       **_cache_options(solve_quantum, cache_dir))
         
         if quantum_result.get("success"):
             print(f"     ✓ Rota: {quantum_result['route']}")
@@ -350,6 +4063,8 @@ def main():
             "classical": classical_route,
             "quantum": quantum_result.get("route")
         }
+        append_result(stream_path, dict(analysis, instance_id=n_cities, classical_route=classical_route,
+                                        config=config))
         
         # Exibir resumo
         print(f"\n📊 RESUMO:")
@@ -364,6 +4079,7 @@ def main():
     print("TABELA COMPARATIVA FINAL")
     print(f"{'='*80}\n")
     
+    results.sort(key=lambda r: r["n_cities"])
     df_results = pd.DataFrame(results)
     
     # Formatar para exibição
@@ -390,6 +4106,8 @@ def main():
     print("SALVANDO RESULTADOS")
     print(f"{'='*80}\n")
     
+    print(f"✓ Resultados incrementais (JSON Lines): {stream_path}")
+    
     # CSV
     csv_path = f"{OUTPUT_DIR}/tsp_results.csv"
     df_results.to_csv(csv_path, index=False)